@@ -0,0 +1,7 @@
+from .backend import Backend, BackendUnavailable
+from .problem import Problem, boundarypsi
+from .solver import BACKENDS, Result, backend_class, solve
+from .solver_utils import check_due, delta_sq, error_norm
+
+__all__ = ['BACKENDS', 'Backend', 'BackendUnavailable', 'Problem', 'Result', 'backend_class', 'boundarypsi',
+           'check_due', 'delta_sq', 'error_norm', 'solve']
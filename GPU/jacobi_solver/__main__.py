@@ -0,0 +1,47 @@
+import argparse
+import sys
+
+import numpy as np
+
+from .problem import Problem
+from .solver import BACKENDS, solve
+
+# python -m jacobi_solver [--backend numpy,numba|all] [--scalefactor 64] [--iterations 1000] [--tolerance 0] ...
+# with more backends, each one solves the problem in turn and its field is compared with the first backend's
+
+
+def parse_options(argv):
+    parser = argparse.ArgumentParser(prog='python -m jacobi_solver', description='Jacobi solver of the CFD cavity')
+    parser.add_argument('--backend', default='numpy', help=f"comma separated of {', '.join(BACKENDS)}, or all")
+    parser.add_argument('--scalefactor', type=int, default=64)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--tolerance', type=float, default=0.0)
+    parser.add_argument('--checkfreq', type=int, default=1, help='iterations between error checks')
+    parser.add_argument('--printfreq', type=int, default=50)
+    parser.add_argument('--parallel-delta', action=argparse.BooleanOptionalAction,
+                        help="error on all cores with numba (default: the backend's choice)")
+    parser.add_argument('--sweeps', type=int, help='iterations per pass over memory of numba (temporal blocking)')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    options = parse_options(argv)
+    names = list(BACKENDS) if options.backend == 'all' else options.backend.split(',')
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        sys.exit(f"unknown backend {', '.join(unknown)}")
+    problem = Problem(options.scalefactor)
+    first = None
+    for name in names:
+        print(f'Backend {name}')
+        backend_options = {'sweeps': options.sweeps} if name == 'numba' and options.sweeps else {}
+        result = solve(problem, name, options.iterations, options.tolerance, options.checkfreq, options.printfreq,
+                       options.parallel_delta, **backend_options)
+        if first is None:
+            first = (name, result)
+        elif not np.array_equal(result.psi, first[1].psi):
+            print(f'Warning: {name} differs from {first[0]} by up to {np.max(np.abs(result.psi - first[1].psi))}')
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
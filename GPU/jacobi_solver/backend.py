@@ -0,0 +1,23 @@
+class BackendUnavailable(Exception):
+    # the backend's package is installed but this host can't run it (e.g. no OpenCL platform)
+    pass
+
+
+class Backend:
+    # every engine keeps two grids with the same boundary: step() writes the next iterate of psi into psinew,
+    # swap() makes it the current one; field() is the current grid on the host;
+    # step_delta() is step() when the error is due, it returns delta_sq() and engines may fuse the two;
+    # advance(sweeps) leaves psi after that many iterations in psinew, engines may run them in fewer passes
+
+    def step_delta(self):
+        self.step()
+        return self.delta_sq()
+
+    def advance(self, sweeps):
+        for _ in range(sweeps - 1):
+            self.step()
+            self.swap()
+        self.step()
+
+    def swap(self):
+        self.psi, self.psinew = self.psinew, self.psi
@@ -0,0 +1,67 @@
+import argparse
+import sys
+
+import numpy as np
+
+from .backend import BackendUnavailable
+from .problem import Problem
+from .solver import BACKENDS, solve
+
+# backend throughput on the cavity problem, against the NumPy backend:
+#   python -m jacobi_solver.benchmark [--backend numba,opencl|all] [--scalefactor 64] [--iterations 200]
+#                                     [--sweeps 1,2,4,8]
+# --sweeps times numba with each number of iterations per pass over memory (temporal blocking), to tune its SWEEPS
+# every backend first runs a small warm-up problem so that JIT compilation is not timed; the reported time is the
+# best of --trials runs
+
+WARMUP_SCALE = 1
+WARMUP_ITERATIONS = 2
+
+
+def measure(name, problem, iterations, trials, **options):
+    solve(Problem(WARMUP_SCALE), name, WARMUP_ITERATIONS, verbose=False, **options)
+    results = [solve(problem, name, iterations, verbose=False, **options) for _ in range(trials)]
+    return min(results, key=lambda result: result.seconds)
+
+
+def report(name, result, baseline):
+    print(f"{name:>12}: {result.rate:10.1f} iterations/s  {result.bandwidth:7.2f} GB/s  "
+          f"{result.rate / baseline.rate:6.2f}x numpy")
+
+
+def parse_options(argv):
+    parser = argparse.ArgumentParser(prog='python -m jacobi_solver.benchmark')
+    parser.add_argument('--backend', default='all', help=f"comma separated of {', '.join(BACKENDS)}, or all")
+    parser.add_argument('--scalefactor', type=int, default=64)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--trials', type=int, default=3)
+    parser.add_argument('--sweeps', default='1', help='comma separated iterations per pass of numba')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    options = parse_options(argv)
+    names = list(BACKENDS) if options.backend == 'all' else options.backend.split(',')
+    problem = Problem(options.scalefactor)
+    print(f"{problem.m} x {problem.n} grid, {options.iterations} iterations")
+    baseline = measure('numpy', problem, options.iterations, options.trials)
+    report('numpy', baseline, baseline)
+    runs = []
+    for name in names:
+        if name == 'numba':
+            runs += [(f'numba k={k}', name, {'sweeps': int(k)}) for k in options.sweeps.split(',')]
+        elif name != 'numpy':
+            runs.append((name, name, {}))
+    for label, name, backend_options in runs:
+        try:
+            result = measure(name, problem, options.iterations, options.trials, **backend_options)
+        except (ImportError, BackendUnavailable) as e:  # the backend can't run on this host
+            print(f"{label:>12}: skipped, {e}")
+            continue
+        report(label, result, baseline)
+        if not np.array_equal(result.psi, baseline.psi):
+            print(f"  Warning: differs from numpy by up to {np.max(np.abs(result.psi - baseline.psi))}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,41 @@
+import math
+
+from numba import cuda
+
+from .backend import Backend
+from .solver_utils import delta_sq
+
+THREADS_PER_BLOCK = (16, 16)
+
+
+@cuda.jit
+def jacobistep(psinew, psi, m, n):
+    i, j = cuda.grid(2)
+    i += 1
+    j += 1
+    if i <= m and j <= n:
+        psinew[i, j] = 0.25 * (psi[i - 1, j] + psi[i + 1, j] + psi[i, j - 1] + psi[i, j + 1])
+
+
+class CudaBackend(Backend):
+    # both grids stay on the device, swap() only exchanges the references; the grids come to the host for the error
+    # (runs on the numba CUDA simulator with NUMBA_ENABLE_CUDASIM=1)
+    name = 'cuda'
+
+    def __init__(self, psi, parallel_delta=False, threads_per_block=THREADS_PER_BLOCK):
+        self.m, self.n = psi.shape[0] - 2, psi.shape[1] - 2
+        self.threads_per_block = threads_per_block
+        self.psi = cuda.to_device(psi)
+        self.psinew = cuda.to_device(psi)
+        self.parallel_delta = parallel_delta
+        self.blocks = (math.ceil(self.m / threads_per_block[0]), math.ceil(self.n / threads_per_block[1]))
+
+    def step(self):
+        jacobistep[self.blocks, self.threads_per_block](self.psinew, self.psi, self.m, self.n)
+        cuda.synchronize()
+
+    def delta_sq(self):
+        return delta_sq(self.psinew.copy_to_host(), self.psi.copy_to_host(), self.m, self.n, self.parallel_delta)
+
+    def field(self):
+        return self.psi.copy_to_host()
@@ -0,0 +1,104 @@
+import numpy as np
+from numba import config, get_thread_id, njit, prange
+
+from .numpy_backend import NumpyBackend
+
+TILE_ROWS = 64  # a tile of the interior is swept by one thread; TILE_COLS doubles of three rows of psi stay in cache
+TILE_COLS = 512
+SWEEPS = 1  # iterations per pass over memory (temporal blocking), tuned with python -m jacobi_solver.benchmark --sweeps
+BLOCK_ROWS = 128  # tiles of the temporally blocked passes, with their halo they are swept SWEEPS times in cache
+BLOCK_COLS = 256
+
+
+@njit(parallel=True, cache=True)
+def jacobistep(psinew, psi, m, n, tile_rows, tile_cols, partial, with_delta):
+    # psinew from psi over the tiles of the interior, in parallel; with with_delta, partial[t] is the sum of
+    # (psinew - psi)^2 over tile t, taken in the same sweep (a fixed order, whatever the number of threads)
+    row_tiles = (m + tile_rows - 1) // tile_rows
+    col_tiles = (n + tile_cols - 1) // tile_cols
+    for t in prange(row_tiles * col_tiles):
+        i0 = 1 + (t // col_tiles) * tile_rows
+        j0 = 1 + (t % col_tiles) * tile_cols
+        i1 = min(i0 + tile_rows, m + 1)
+        j1 = min(j0 + tile_cols, n + 1)
+        dsq = 0.0
+        for i in range(i0, i1):
+            for j in range(j0, j1):
+                new = 0.25 * (psi[i - 1, j] + psi[i + 1, j] + psi[i, j - 1] + psi[i, j + 1])
+                psinew[i, j] = new
+                if with_delta:
+                    d = new - psi[i, j]
+                    dsq += d * d
+        partial[t] = dsq
+
+
+@njit(parallel=True, cache=True)
+def jacobiblock(psinew, psi, m, n, sweeps, tile_rows, tile_cols, scratch):
+    # psinew after sweeps iterations from psi, tile by tile: a tile and a halo of sweeps points are copied to the
+    # thread's two scratch grids, swept there with the region shrinking by one point per sweep, and the tile of the
+    # last sweep is written back; every point is computed as in jacobistep, so the result is the same to the bit
+    row_tiles = (m + tile_rows - 1) // tile_rows
+    col_tiles = (n + tile_cols - 1) // tile_cols
+    for t in prange(row_tiles * col_tiles):
+        grids = scratch[get_thread_id()]
+        i0 = 1 + (t // col_tiles) * tile_rows
+        j0 = 1 + (t % col_tiles) * tile_cols
+        i1 = min(i0 + tile_rows, m + 1)
+        j1 = min(j0 + tile_cols, n + 1)
+        oi = i0 - sweeps  # global (i, j) is (i - oi, j - oj) in the scratch grids
+        oj = j0 - sweeps
+        for i in range(max(oi, 0), min(i1 + sweeps, m + 2)):
+            for j in range(max(oj, 0), min(j1 + sweeps, n + 2)):
+                grids[0, i - oi, j - oj] = psi[i, j]
+                grids[1, i - oi, j - oj] = psi[i, j]  # the boundary points of the region are read from both
+        for s in range(1, sweeps + 1):
+            src = grids[(s - 1) % 2]
+            dst = grids[s % 2]
+            halo = sweeps - s
+            for i in range(max(i0 - halo, 1), min(i1 + halo, m + 1)):
+                for j in range(max(j0 - halo, 1), min(j1 + halo, n + 1)):
+                    li = i - oi
+                    lj = j - oj
+                    dst[li, lj] = 0.25 * (src[li - 1, lj] + src[li + 1, lj] + src[li, lj - 1] + src[li, lj + 1])
+        last = grids[sweeps % 2]
+        for i in range(i0, i1):
+            for j in range(j0, j1):
+                psinew[i, j] = last[i - oi, j - oj]
+
+
+class NumbaBackend(NumpyBackend):
+    # the step on all cores, tile by tile, with no allocation per iteration; the error comes out of the step;
+    # with sweeps > 1, advance() runs up to sweeps iterations per pass over memory
+    name = 'numba'
+
+    def __init__(self, psi, parallel_delta=True, tile_rows=TILE_ROWS, tile_cols=TILE_COLS, sweeps=SWEEPS,
+                 block_rows=BLOCK_ROWS, block_cols=BLOCK_COLS):
+        super().__init__(psi, parallel_delta)
+        self.tile_rows, self.tile_cols = tile_rows, tile_cols
+        tiles = -(-self.m // tile_rows) * -(-self.n // tile_cols)
+        self.partial = np.zeros(tiles, dtype=np.float64)
+        self.sweeps = sweeps
+        self.block_rows, self.block_cols = block_rows, block_cols
+        if sweeps > 1:  # two grids of a tile and its halo per thread
+            self.scratch = np.empty((config.NUMBA_NUM_THREADS, 2, block_rows + 2 * sweeps, block_cols + 2 * sweeps))
+
+    def step(self):
+        jacobistep(self.psinew, self.psi, self.m, self.n, self.tile_rows, self.tile_cols, self.partial, False)
+
+    def step_delta(self):
+        jacobistep(self.psinew, self.psi, self.m, self.n, self.tile_rows, self.tile_cols, self.partial, True)
+        return float(np.sum(self.partial))
+
+    def advance(self, sweeps):
+        if self.sweeps == 1:
+            return super().advance(sweeps)
+        while sweeps > 0:
+            block = min(sweeps, self.sweeps)
+            if block == 1:
+                self.step()
+            else:
+                jacobiblock(self.psinew, self.psi, self.m, self.n, block, self.block_rows, self.block_cols,
+                            self.scratch)
+            sweeps -= block
+            if sweeps:
+                self.swap()
@@ -0,0 +1,24 @@
+from .backend import Backend
+from .solver_utils import delta_sq
+
+
+class NumpyBackend(Backend):
+    name = 'numpy'
+
+    def __init__(self, psi, parallel_delta=False):
+        self.m, self.n = psi.shape[0] - 2, psi.shape[1] - 2
+        self.psi = psi.copy()
+        self.psinew = psi.copy()
+        self.parallel_delta = parallel_delta
+
+    def step(self):
+        m, n = self.m, self.n
+        psi = self.psi
+        self.psinew[1:m + 1, 1:n + 1] = 0.25 * (psi[:m, 1:n + 1] + psi[2:m + 2, 1:n + 1]
+                                                + psi[1:m + 1, :n] + psi[1:m + 1, 2:n + 2])
+
+    def delta_sq(self):
+        return delta_sq(self.psinew, self.psi, self.m, self.n, self.parallel_delta)
+
+    def field(self):
+        return self.psi
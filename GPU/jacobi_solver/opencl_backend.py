@@ -0,0 +1,129 @@
+import numpy as np
+import pyopencl as cl
+
+from .backend import Backend, BackendUnavailable
+
+LOCAL_SIZE = (16, 16)  # work-group of the kernels, the reductions need a power of two work-items
+
+KERNEL = """
+// the sum of value over the work-group, a tree in local memory; work-item 0 stores it in partial[group]
+void reduce_group(__local double *scratch, double value, __global double *partial) {
+
+    int lid = get_local_id(0)*get_local_size(1) + get_local_id(1);
+
+    scratch[lid] = value;
+    barrier(CLK_LOCAL_MEM_FENCE);
+    for (int s = get_local_size(0)*get_local_size(1)/2; s > 0; s >>= 1) {
+        if (lid < s) {
+            scratch[lid] += scratch[lid + s];
+        }
+        barrier(CLK_LOCAL_MEM_FENCE);
+    }
+    if (lid == 0) {
+        partial[get_group_id(0)*get_num_groups(1) + get_group_id(1)] = scratch[0];
+    }
+}
+
+__kernel void jacobistep(__global double *psinew, __global const double *psi, const int m, const int n) {
+
+    int i = get_global_id(0) + 1;
+    int j = get_global_id(1) + 1;
+
+    if (i <= m && j <= n) {
+        psinew[i*(n+2)+j] = 0.25*(psi[(i-1)*(n+2)+j] + psi[(i+1)*(n+2)+j] + psi[i*(n+2)+j-1] + psi[i*(n+2)+j+1]);
+    }
+}
+
+// jacobistep and the sum of (psinew - psi)^2 of the work-group in the same pass
+__kernel void jacobistep_delta(__global double *psinew, __global const double *psi, const int m, const int n,
+                               __global double *partial, __local double *scratch) {
+
+    int i = get_global_id(0) + 1;
+    int j = get_global_id(1) + 1;
+    double d = 0.0;
+
+    if (i <= m && j <= n) {
+        double v = 0.25*(psi[(i-1)*(n+2)+j] + psi[(i+1)*(n+2)+j] + psi[i*(n+2)+j-1] + psi[i*(n+2)+j+1]);
+        psinew[i*(n+2)+j] = v;
+        d = v - psi[i*(n+2)+j];
+    }
+    reduce_group(scratch, d*d, partial);
+}
+
+__kernel void deltasq(__global const double *psinew, __global const double *psi, const int m, const int n,
+                      __global double *partial, __local double *scratch) {
+
+    int i = get_global_id(0) + 1;
+    int j = get_global_id(1) + 1;
+    double d = 0.0;
+
+    if (i <= m && j <= n) {
+        d = psinew[i*(n+2)+j] - psi[i*(n+2)+j];
+    }
+    reduce_group(scratch, d*d, partial);
+}
+"""
+
+
+def first_device():
+    try:
+        devices = [device for platform in cl.get_platforms() for device in platform.get_devices()]
+    except cl.Error:  # no OpenCL driver (ICD) installed, or a platform without devices
+        devices = []
+    if not devices:
+        raise BackendUnavailable("no OpenCL platform with a device")
+    return devices[0]
+
+
+class OpenCLBackend(Backend):
+    # both grids stay on the device, swap() only exchanges the buffers given to the kernels; the kernels are
+    # enqueued without waiting, each after the event of the previous one, and only the sums of the work-groups
+    # come back for the error; the field is read once at the end
+    # (the first device of the platforms, a CPU platform such as PoCL will do)
+    name = 'opencl'
+
+    def __init__(self, psi, parallel_delta=False, local_size=LOCAL_SIZE):
+        self.m, self.n = psi.shape[0] - 2, psi.shape[1] - 2
+        self.host = psi.copy()
+        device = first_device()
+        self.context = cl.Context([device])
+        self.queue = cl.CommandQueue(self.context, device)
+        program = cl.Program(self.context, KERNEL).build()
+        self.step_kernel = cl.Kernel(program, 'jacobistep')
+        self.step_delta_kernel = cl.Kernel(program, 'jacobistep_delta')
+        self.delta_kernel = cl.Kernel(program, 'deltasq')
+        mf = cl.mem_flags
+        # the kernels write the inner points only, both grids start with the boundary
+        self.psi = cl.Buffer(self.context, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=self.host)
+        self.psinew = cl.Buffer(self.context, mf.READ_WRITE | mf.COPY_HOST_PTR, hostbuf=self.host)
+        self.local_size = local_size
+        groups = (-(-self.m // local_size[0]), -(-self.n // local_size[1]))
+        self.global_size = (groups[0] * local_size[0], groups[1] * local_size[1])
+        self.partial = np.empty(groups[0] * groups[1], dtype=np.float64)
+        self.partial_buffer = cl.Buffer(self.context, mf.WRITE_ONLY, self.partial.nbytes)
+        self.scratch = cl.LocalMemory(8 * local_size[0] * local_size[1])
+        self.event = None  # of the last kernel enqueued
+
+    def run(self, kernel, *args):
+        kernel.set_args(self.psinew, self.psi, np.int32(self.m), np.int32(self.n), *args)
+        self.event = cl.enqueue_nd_range_kernel(self.queue, kernel, self.global_size, self.local_size,
+                                                wait_for=[self.event] if self.event else None)
+
+    def sum_partial(self):
+        cl.enqueue_copy(self.queue, self.partial, self.partial_buffer, wait_for=[self.event])
+        return float(np.sum(self.partial))
+
+    def step(self):
+        self.run(self.step_kernel)
+
+    def step_delta(self):
+        self.run(self.step_delta_kernel, self.partial_buffer, self.scratch)
+        return self.sum_partial()
+
+    def delta_sq(self):
+        self.run(self.delta_kernel, self.partial_buffer, self.scratch)
+        return self.sum_partial()
+
+    def field(self):
+        cl.enqueue_copy(self.queue, self.host, self.psi, wait_for=[self.event] if self.event else None)
+        return self.host
@@ -0,0 +1,33 @@
+import numpy as np
+
+# the CFD cavity problem: the stream function psi on an (m + 2) x (n + 2) grid, the inner m x n points are solved
+# for, the edges hold the boundary conditions of the inlet (bottom edge) and outlet (right edge)
+BBASE = 10  # simulation sizes at scale factor 1
+HBASE = 15
+WBASE = 5
+MBASE = 32
+NBASE = 32
+
+
+class Problem:
+    def __init__(self, scalefactor=64):
+        self.scalefactor = scalefactor
+        self.b, self.h, self.w, self.m, self.n = [x * scalefactor for x in [BBASE, HBASE, WBASE, MBASE, NBASE]]
+
+    def initial_psi(self):
+        psi = np.zeros((self.m + 2, self.n + 2), dtype=np.float64)
+        return boundarypsi(psi, self.m, self.b, self.h, self.w)
+
+
+def boundarypsi(psi, m, b, h, w):
+    # BCs on the bottom edge
+    for i in range(b + 1, b + w):
+        psi[i, 0] = i - b
+    for i in range(b + w, m + 1):
+        psi[i, 0] = w
+    # BCs on the right edge
+    for j in range(1, h + 1):
+        psi[m + 1, j] = w
+    for j in range(h + 1, h + w):
+        psi[m + 1, j] = w - j + h
+    return psi
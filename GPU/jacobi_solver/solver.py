@@ -0,0 +1,99 @@
+import importlib
+import time
+
+import numpy as np
+
+from .problem import Problem
+from .solver_utils import check_due
+
+# backend name -> module and class, imported when used since every backend needs its own optional package
+BACKENDS = {
+    'numpy': ('numpy_backend', 'NumpyBackend'),
+    'numba': ('numba_backend', 'NumbaBackend'),
+    'opencl': ('opencl_backend', 'OpenCLBackend'),
+    'cuda': ('cuda_backend', 'CudaBackend'),
+}
+# memory traffic of one sweep per inner point: psi read once and psinew written once, the neighbours come from cache
+BYTES_PER_POINT = 16
+
+
+def backend_class(name):
+    module, cls = BACKENDS[name]
+    return getattr(importlib.import_module(f'.{module}', __package__), cls)
+
+
+class Result:
+    def __init__(self, psi, iterations, error, converged, seconds):
+        self.psi = psi
+        self.iterations = iterations
+        self.error = error
+        self.converged = converged
+        self.seconds = seconds
+
+    @property
+    def rate(self):  # iterations per second
+        return self.iterations / self.seconds if self.seconds > 0 else float('inf')
+
+    @property
+    def bandwidth(self):  # effective memory bandwidth in GB/s
+        m, n = self.psi.shape[0] - 2, self.psi.shape[1] - 2
+        return self.rate * BYTES_PER_POINT * m * n / 1e9
+
+
+def next_stop(iteration, numiter, checkerr, checkfreq, printfreq):
+    # the first iteration after this one with an error check or a report
+    stop = min(numiter, (iteration // printfreq + 1) * printfreq)
+    if checkerr:
+        stop = min(stop, (iteration // checkfreq + 1) * checkfreq)
+    return stop
+
+
+def solve(problem=None, backend='numpy', numiter=1000, tolerance=0.0, checkfreq=1, printfreq=50,
+          parallel_delta=None, verbose=True, **options):
+    # options go to the backend, e.g. sweeps=4 for temporal blocking with numba
+    # Jacobi iterations until numiter or until the error (the change of psi relative to the boundary norm)
+    # is below tolerance; the error is computed every checkfreq iterations when tolerance > 0, and after the last one
+    problem = problem or Problem()
+    psi = problem.initial_psi()
+    bnorm = np.sqrt(np.sum(psi ** 2))  # normalisation factor for the error
+    if parallel_delta is not None:  # otherwise the backend's default
+        options['parallel_delta'] = parallel_delta
+    engine = backend_class(backend)(psi, **options)
+    checkerr = tolerance > 0.0
+    error = np.inf
+    converged = False
+    iteration = 0
+    time_start = time.time()
+    while iteration < numiter:
+        # the iterations up to the next error check or report are the engine's to run as it likes (advance),
+        # the one with the error check is a step of its own
+        stop = next_stop(iteration, numiter, checkerr, checkfreq, printfreq)
+        if check_due(stop, numiter, checkerr, checkfreq):
+            if stop - iteration > 1:
+                engine.advance(stop - iteration - 1)
+                engine.swap()
+            iteration = stop
+            error = np.sqrt(engine.step_delta()) / bnorm  # psi of the next iteration and the error
+            if checkerr and error < tolerance:
+                converged = True
+                if verbose:
+                    print(f'Converged on iteration {iteration}')
+                break
+        else:
+            engine.advance(stop - iteration)
+            iteration = stop
+        engine.swap()
+        if verbose and iteration % printfreq == 0:
+            if not checkerr:
+                print(f'Completed iteration {iteration}')
+            else:
+                print(f'Completed iteration {iteration}, error = {error}')
+    psi = engine.field()
+    seconds = time.time() - time_start
+    if verbose:
+        print(f'After {iteration} iterations, the error is: {error}')
+        print(f"Time for {iteration} iterations was {seconds:.2f} seconds")
+    result = Result(psi, iteration, error, converged, seconds)
+    if verbose:
+        print(f"{result.rate:.1f} iterations/s, effective bandwidth {result.bandwidth:.2f} GB/s")
+    return result
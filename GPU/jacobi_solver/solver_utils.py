@@ -0,0 +1,51 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional here, only the parallel delta needs it
+    njit = None
+
+CHUNK_ROWS = 256  # rows of the grid per block, the only temporary is one block of differences
+
+
+def delta_sq(new_arr, old_arr, m, n, parallel=False, chunk_rows=CHUNK_ROWS):
+    # sum of (new - old)^2 over the interior points [1..m, 1..n] of two (m + 2) x (n + 2) grids
+    # (flat arrays are taken as such grids), block by block without full size temporaries
+    new_arr = new_arr.reshape(m + 2, n + 2)
+    old_arr = old_arr.reshape(m + 2, n + 2)
+    if parallel:
+        if njit is None:
+            raise ImportError("the parallel delta needs numba")
+        return _delta_sq_parallel(new_arr, old_arr, m, n)
+    dsq = 0.0
+    diff = np.empty((min(chunk_rows, m), n), dtype=np.float64)
+    for start in range(1, m + 1, chunk_rows):
+        stop = min(start + chunk_rows, m + 1)
+        block = diff[:stop - start]
+        np.subtract(new_arr[start:stop, 1:n + 1], old_arr[start:stop, 1:n + 1], out=block)
+        flat = block.ravel()
+        dsq += float(np.dot(flat, flat))
+    return dsq
+
+
+def error_norm(new_arr, old_arr, m, n, bnorm, parallel=False):
+    # the convergence error of the drivers: the delta norm relative to the boundary norm
+    return np.sqrt(delta_sq(new_arr, old_arr, m, n, parallel)) / bnorm
+
+
+def check_due(iteration, numiter, checkerr, checkfreq):
+    # the error is computed every checkfreq iterations when checking for convergence, and after the last one
+    return (checkerr and iteration % checkfreq == 0) or iteration == numiter
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _delta_sq_parallel(new_arr, old_arr, m, n):
+        dsq = 0.0
+        for i in prange(1, m + 1):
+            row = 0.0
+            for j in range(1, n + 1):
+                d = new_arr[i, j] - old_arr[i, j]
+                row += d * d
+            dsq += row
+        return dsq
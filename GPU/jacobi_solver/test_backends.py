@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from jacobi_solver import BackendUnavailable, Problem, solve
+
+# every backend must give the field of the numpy one to the bit, and converge on the same iteration
+CASES = [(1, 37, 0.0, 1), (1, 5000, 1e-4, 7)]  # scalefactor, iterations, tolerance, checkfreq
+
+
+@pytest.mark.parametrize('scalefactor, numiter, tolerance, checkfreq', CASES)
+@pytest.mark.parametrize('backend, options', [('numba', {}), ('numba', {'sweeps': 4}), ('opencl', {})])
+def test_backend_matches_numpy(backend, options, scalefactor, numiter, tolerance, checkfreq):
+    pytest.importorskip(backend if backend != 'opencl' else 'pyopencl')
+    expected = solve(Problem(scalefactor), 'numpy', numiter, tolerance, checkfreq, verbose=False)
+    try:
+        result = solve(Problem(scalefactor), backend, numiter, tolerance, checkfreq, verbose=False, **options)
+    except BackendUnavailable as e:
+        pytest.skip(str(e))
+    assert np.array_equal(result.psi, expected.psi)
+    assert result.iterations == expected.iterations
+    assert result.converged == expected.converged
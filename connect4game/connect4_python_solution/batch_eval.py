@@ -0,0 +1,104 @@
+import numpy as np
+
+from board import EMPTY, CPU, HUMAN, table_key, Expand
+
+# Evaluate with the last plies done in one numpy pass: at BATCH_PLIES above the horizon all positions
+# below are stacked into an (N, rows, cols) array of the mover's stones and checked for four in a row
+# (k in a row) with shifted ANDs, instead of calling GameEnd on one board at a time
+BATCH_PLIES = 2  # 1 or 2
+
+
+def wins(stones, k=4):
+    # which of the stacked boards have k stones in a line
+    n, rows, cols = stones.shape
+    found = np.zeros(n, dtype=bool)
+    for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        r_len = rows - dr * (k - 1)
+        c_len = cols - abs(dc) * (k - 1)
+        if r_len <= 0 or c_len <= 0:
+            continue
+        line = np.ones((n, r_len, c_len), dtype=bool)
+        for i in range(k):
+            r0 = dr * i
+            c0 = dc * i if dc >= 0 else (k - 1) + dc * i
+            line &= stones[:, r0:r0 + r_len, c0:c0 + c_len]
+        found |= line.any(axis=(1, 2))
+    return found
+
+
+def stones_of(B, player):
+    # (rows, cols) bool array of player's stones
+    if hasattr(B, 'stones'):
+        # bitboard: unpack the int, column c is bits c * stride .. c * stride + rows - 1
+        nbytes = (B.cols * B.stride + 7) // 8
+        bits = np.unpackbits(np.frombuffer(B.stones[player].to_bytes(nbytes, 'little'), dtype=np.uint8),
+                             bitorder='little')
+        return bits[:B.cols * B.stride].reshape(B.cols, B.stride)[:, :B.rows].T.astype(bool)
+    return np.asarray(B.field) == player if player != EMPTY else np.zeros((B.rows, B.cols), dtype=bool)
+
+
+def fold(values, LastMover):
+    # the same rules as in board.Expand, values in column order
+    for value in values:
+        if value == 1 and LastMover == CPU:
+            return 1
+        if value == -1 and LastMover == HUMAN:
+            return -1
+    if all(value == 1 for value in values):
+        return 1
+    if all(value <= -1 for value in values):
+        return -1
+    dTotal = 0
+    for value in values:
+        dTotal += value
+    return dTotal / len(values)
+
+
+def leaf_value(Current, LastMover, iDepth):
+    # value of a position 1 or 2 plies above the horizon that is not a game end
+    NewMover = HUMAN if LastMover == CPU else CPU
+    rows = Current.rows
+    height = np.asarray(Current.height)
+    legal = np.flatnonzero(height < rows)
+    # children: one stone of NewMover more
+    children = np.repeat(stones_of(Current, NewMover)[None], len(legal), axis=0)
+    children[np.arange(len(legal)), height[legal], legal] = True
+    won = wins(children, Current.k)
+    values = np.where(won, 1.0 if NewMover == CPU else -1.0, 0.0)
+    if iDepth == 2:
+        # grandchildren of the children that are not won: one stone of LastMover more
+        open_children = np.flatnonzero(~won)
+        heights = np.repeat(height[None], len(open_children), axis=0)
+        heights[np.arange(len(open_children)), legal[open_children]] += 1
+        child, col = np.nonzero(heights < rows)
+        grand = np.repeat(stones_of(Current, LastMover)[None], len(child), axis=0)
+        grand[np.arange(len(child)), heights[child, col], col] = True
+        grand_won = wins(grand, Current.k)
+        # a child's grandchildren are all 0 or a win of LastMover, so the Expand rules reduce to the share of wins
+        # (and 1 for a child without moves)
+        moves = np.bincount(child, minlength=len(open_children))
+        won_moves = np.bincount(child[grand_won], minlength=len(open_children))
+        win = 1.0 if LastMover == CPU else -1.0
+        values[open_children] = np.where(moves == 0, 1.0, win * won_moves / np.maximum(moves, 1))
+    return fold(values.tolist(), LastMover)
+
+
+def batch_evaluate(Current, LastMover, iLastCol, iDepth, tt=None):
+    # drop-in for board.Evaluate, with the same values
+    if Current.GameEnd(iLastCol):
+        return 1 if LastMover == CPU else -1
+
+    if iDepth == 0:
+        return 0
+
+    if iDepth <= BATCH_PLIES:
+        return leaf_value(Current, LastMover, iDepth)
+
+    if tt is None:
+        return Expand(Current, LastMover, iDepth, tt, batch_evaluate)
+    key = table_key(tt, Current, LastMover)
+    dResult = tt.probe(key, iDepth)
+    if dResult is None:
+        dResult = Expand(Current, LastMover, iDepth, tt, batch_evaluate)
+        tt.store(key, iDepth, dResult)
+    return dResult
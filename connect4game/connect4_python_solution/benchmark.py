@@ -0,0 +1,165 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from board import CPU
+from positions import from_moves
+
+# scaling benchmark: times cpu_make_move on the stored positions for every backend, LEVEL and number of processes,
+# compares it with the sequential Evaluate and writes the results plot.py reads:
+#   python benchmark.py [benchmark.csv]
+# every configuration runs in its own processes (under mpiexec for the 'mpi' backend), started by this script as:
+#   benchmark.py run BACKEND LEVEL PROCESSES RAW.jsonl
+# the other settings (DEPTH aside, table, board, JIT, ...) are the ones in main.py
+
+POSITIONS = {  # name -> columns played from the empty board, the human first; the CPU is to move in all of them
+    'opening': '3',
+    'early': '33242',
+    'middle': '3324215',
+    'late': '332421566',
+}
+BACKENDS = ['mpi', 'pool']
+LEVELS = [1, 2, 3]
+PROCESSES = [1, 2, 4, 8]  # MPI ranks (the master included) or pool processes
+TRIALS = 3  # the median time of the trials counts
+BENCH_DEPTH = 7
+MPIEXEC = ['mpiexec']  # e.g. ['mpiexec', '--oversubscribe'] for more ranks than cores
+REGRESSION = 0.1  # efficiency drops against the previous results file bigger than this are reported
+
+
+def sequential_move(B, depth, evaluate, tt):
+    # the original program: the CPU moves evaluated one after the other in one process
+    best = None
+    prevCol = B.LastCol
+    prevMover = B.LastMover
+    for col in range(B.Columns()):
+        if B.MoveLegal(col):
+            B.Move(col, CPU)
+            value = evaluate(B, CPU, col, depth - 1, tt)
+            B.UndoMove(col, prevCol, prevMover)
+            if best is None or value > best[1]:
+                best = (col, value)
+    return best[0]
+
+
+def run(backend, level, processes, raw_path):
+    # one configuration, all positions and trials; main is imported here so that only these processes start MPI
+    import main
+    if main.rank != 0:
+        main.main()  # the worker loop, until the master closes the backend
+        return
+    main.LEVEL = main.POOL_LEVEL = level
+    main.POOL_WORKERS = processes
+    if backend != 'sequential':
+        main.BACKEND = backend
+        main.post_receives()
+        main.backend = main.new_backend()
+    with open(raw_path, 'a') as raw:
+        for name, moves in POSITIONS.items():
+            for trial in range(TRIALS):
+                B = from_moves(main.new_board(), moves)
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):  # the move reports
+                    if backend == 'sequential':
+                        if main.tt is not None:
+                            main.tt.clear()
+                        col = sequential_move(B, BENCH_DEPTH, main.evaluate, main.tt)
+                    else:
+                        col = main.cpu_make_move(B, BENCH_DEPTH).LastCol
+                seconds = time.time() - start
+                raw.write(json.dumps({'backend': backend, 'level': level, 'processes': processes,
+                                      'position': name, 'trial': trial, 'seconds': seconds, 'move': col}) + "\n")
+    if main.backend is not None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.backend.close()
+
+
+def measure(backend, level, processes, raw_path):
+    command = [sys.executable, os.path.abspath(__file__), 'run', backend, str(level), str(processes), raw_path]
+    if backend == 'mpi':
+        command = MPIEXEC + ['-n', str(processes)] + command
+    print(f"{backend}, level {level}, {processes} processes", flush=True)
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+
+def summarize(raw_path):
+    # per configuration: the summed median times of the positions, speedup and efficiency against the sequential run
+    times = {}
+    moves = {}
+    with open(raw_path) as f:
+        for line in f:
+            r = json.loads(line)
+            times.setdefault((r['backend'], r['level'], r['processes'], r['position']), []).append(r['seconds'])
+            moves[r['backend'], r['level'], r['processes'], r['position']] = r['move']
+    baseline = {key[3]: statistics.median(seconds) for key, seconds in times.items() if key[0] == 'sequential'}
+    rows = []
+    for backend in BACKENDS:
+        for level in LEVELS:
+            for processes in PROCESSES:
+                keys = [(backend, level, processes, name) for name in POSITIONS]
+                if not all(key in times for key in keys):
+                    continue
+                for key in keys:
+                    if moves[key] != moves['sequential', 0, 1, key[3]]:
+                        print(f"Warning: {backend}, level {level}, {processes} processes plays {moves[key]} "
+                              f"in '{key[3]}', the sequential search {moves['sequential', 0, 1, key[3]]}")
+                seconds = sum(statistics.median(times[key]) for key in keys)
+                speedup = sum(baseline.values()) / seconds
+                rows.append({'backend': backend, 'level': level, 'processes': processes,
+                             'seconds': round(seconds, 4), 'speedup': round(speedup, 4),
+                             'efficiency': round(speedup / processes, 4)})
+    return rows
+
+
+def read_results(path):
+    with open(path) as f:
+        return [{'backend': row['backend'], 'level': int(row['level']), 'processes': int(row['processes']),
+                 'seconds': float(row['seconds']), 'speedup': float(row['speedup']),
+                 'efficiency': float(row['efficiency'])} for row in csv.DictReader(f)]
+
+
+def report(rows, previous):
+    old = {(row['backend'], row['level'], row['processes']): row['efficiency'] for row in previous}
+    for row in rows:
+        print(f"{row['backend']}, level {row['level']}, {row['processes']} processes: {row['seconds']:.3f} s, "
+              f"speedup {row['speedup']:.2f}, efficiency {row['efficiency']:.3f}")
+        key = (row['backend'], row['level'], row['processes'])
+        if key in old and old[key] - row['efficiency'] > REGRESSION:
+            print(f"  regression: efficiency was {old[key]:.3f}")
+    for backend in BACKENDS:
+        for processes in PROCESSES:
+            candidates = [row for row in rows if row['backend'] == backend and row['processes'] == processes]
+            if candidates:
+                best = max(candidates, key=lambda row: row['speedup'])
+                print(f"Best LEVEL for {backend} with {processes} processes: {best['level']}")
+
+
+def main():
+    results_path = sys.argv[1] if len(sys.argv) > 1 else 'benchmark.csv'
+    raw_path = os.path.splitext(results_path)[0] + '.jsonl'
+    previous = read_results(results_path) if os.path.exists(results_path) else []
+    open(raw_path, 'w').close()
+    measure('sequential', 0, 1, raw_path)
+    for backend in BACKENDS:
+        for level in LEVELS:
+            for processes in PROCESSES:
+                measure(backend, level, processes, raw_path)
+    rows = summarize(raw_path)
+    with open(results_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['backend', 'level', 'processes', 'seconds', 'speedup', 'efficiency'])
+        writer.writeheader()
+        writer.writerows(rows)
+    report(rows, previous)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'run':
+        run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5])
+    else:
+        main()
@@ -0,0 +1,110 @@
+import numpy as np
+
+from board import EMPTY, CPU, HUMAN, zobrist_table, win_lines
+
+_mask_tables = {}
+
+
+def win_masks(rows, cols, k):
+    # board.win_lines as bit masks, one list per cell (row * cols + col)
+    if (rows, cols, k) not in _mask_tables:
+        lines, counts = win_lines(rows, cols, k)
+        stride = rows + 1
+        _mask_tables[rows, cols, k] = [[sum(1 << (int(i) % cols * stride + int(i) // cols) for i in line)
+                                        for line in lines[cell, :counts[cell]]] for cell in range(rows * cols)]
+    return _mask_tables[rows, cols, k]
+
+
+class BitBoard:
+    # same interface as board.Board, but each player's stones are packed into one python int;
+    # column c uses bits c*(rows+1) .. c*(rows+1)+rows-1, the extra top bit is an always empty
+    # sentinel so that shifted lines can not wrap over into the next column
+    def __init__(self, rows=6, cols=7, k=4):
+        self.rows = rows
+        self.cols = cols
+        self.k = k  # stones in a line that win
+        self.LastMover = EMPTY
+        self.LastCol = -1
+        self.stride = rows + 1  # bits per column (with the sentinel)
+        self.stones = [0, 0, 0]  # bitboard of each player, indexed with CPU / HUMAN
+        self.height = [0] * cols
+        self.hash = 0  # zobrist hash of the stones, kept up to date by Move / UndoMove
+        self.mirror_hash = 0  # hash of the left-right mirrored stones
+        self.zobrist = zobrist_table(rows, cols)
+        self.masks = win_masks(rows, cols, k)
+
+    def __getstate__(self):
+        # the zobrist and mask tables are shared, don't copy / pickle them with every board
+        state = self.__dict__.copy()
+        del state['zobrist'], state['masks']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.zobrist = zobrist_table(self.rows, self.cols)
+        self.masks = win_masks(self.rows, self.cols, self.k)
+
+    def Columns(self):
+        return self.cols
+
+    def Symmetric(self):
+        return self.hash == self.mirror_hash
+
+    def MoveLegal(self, col):
+        return self.height[col] < self.rows
+
+    def Move(self, col, player):
+        h = self.height[col]
+        if h == self.rows:
+            return False
+        self.stones[player] |= 1 << (col * self.stride + h)
+        self.hash ^= self.zobrist[player][col][h]
+        self.mirror_hash ^= self.zobrist[player][self.cols - 1 - col][h]
+        self.height[col] = h + 1
+        self.LastMover = player
+        self.LastCol = col
+        return True
+
+    def UndoMove(self, col, prevCol, prevMover):
+        h = self.height[col] - 1
+        if h < 0:
+            return False
+        bit = 1 << (col * self.stride + h)
+        player = CPU if self.stones[CPU] & bit else HUMAN
+        self.stones[player] ^= bit
+        self.hash ^= self.zobrist[player][col][h]
+        self.mirror_hash ^= self.zobrist[player][self.cols - 1 - col][h]
+        self.height[col] = h
+        self.LastCol = prevCol
+        self.LastMover = prevMover
+        return True
+
+    def Owner(self, row, col):
+        bit = 1 << (col * self.stride + row)
+        if self.stones[CPU] & bit:
+            return CPU
+        if self.stones[HUMAN] & bit:
+            return HUMAN
+        return EMPTY
+
+    def GameEnd(self, last_col):
+        if last_col < 0:  # no move yet
+            return False
+        row = self.height[last_col] - 1
+        if row < 0:
+            return False
+        # only the lines through the top stone of last_col are checked
+        pos = self.stones[self.Owner(row, last_col)]
+        for mask in self.masks[row * self.cols + last_col]:
+            if pos & mask == mask:
+                return True
+        return False
+
+    @property
+    def field(self):
+        # numpy view of the position, only for printing and draw checks (not used while searching)
+        field = np.full((self.rows, self.cols), EMPTY)
+        for c in range(self.cols):
+            for r in range(self.height[c]):
+                field[r, c] = self.Owner(r, c)
+        return field
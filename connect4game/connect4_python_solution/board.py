@@ -1,3 +1,4 @@
+import random
 import sys
 
 import numpy as np
@@ -6,19 +7,91 @@ EMPTY = 0
 CPU = 1
 HUMAN = 2
 
+ZOBRIST_SEED = 2024  # fixed, so every MPI rank hashes positions the same way
+_zobrist_tables = {}
+_line_tables = {}
+
+
+def zobrist_table(rows, cols):
+    # random key for every (player, column, row), shared by all boards of the same size
+    if (rows, cols) not in _zobrist_tables:
+        rng = random.Random(ZOBRIST_SEED)
+        _zobrist_tables[rows, cols] = [[[rng.getrandbits(63) for _ in range(rows)] for _ in range(cols)]
+                                       for _ in (EMPTY, CPU, HUMAN)]
+    return _zobrist_tables[rows, cols]
+
+
+def win_lines(rows, cols, k):
+    # the lines of k cells a move into each cell can complete, as flat cell indices (row * cols + col):
+    # lines[cell, :counts[cell]]; a move is always the top stone of its column, so of the vertical lines
+    # only the one that ends in the cell is kept; shared by all boards of the same geometry
+    if (rows, cols, k) not in _line_tables:
+        cell_lines = [[] for _ in range(rows * cols)]
+        for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            for r in range(rows):
+                for c in range(cols):
+                    cells = [(r + dr * i, c + dc * i) for i in range(k)]
+                    if not all(0 <= rr < rows and 0 <= cc < cols for rr, cc in cells):
+                        continue
+                    line = [rr * cols + cc for rr, cc in cells]
+                    for cell in (line[-1:] if dc == 0 else line):
+                        cell_lines[cell].append(line)
+        counts = np.array([len(lines) for lines in cell_lines], dtype=np.int64)
+        lines = np.zeros((rows * cols, max(int(counts.max()), 1), k), dtype=np.int64)
+        for cell, found in enumerate(cell_lines):
+            lines[cell, :len(found)] = found
+        _line_tables[rows, cols, k] = lines, counts
+    return _line_tables[rows, cols, k]
+
+
+# the side that moved last is part of the evaluated position, mixed into the hash for table keys
+MOVER_KEYS = [0, 0x5bd1e9955bd1e995, 0x2545f4914f6cdd1d]
+
+
+def position_key(B, LastMover):
+    return B.hash ^ MOVER_KEYS[LastMover]
+
+
+def canonical_key(B, LastMover):
+    # a position and its left-right mirror image have the same value, so they share one key
+    return min(B.hash, B.mirror_hash) ^ MOVER_KEYS[LastMover]
+
+
+def table_key(tt, B, LastMover):
+    return canonical_key(B, LastMover) if tt.canonical else position_key(B, LastMover)
+
 
 class Board:
-    def __init__(self, rows=6, cols=7):
+    def __init__(self, rows=6, cols=7, k=4):
         self.rows = rows
         self.cols = cols
+        self.k = k  # stones in a line that win
         self.LastMover = EMPTY
         self.LastCol = -1
         self.field = np.full((rows, cols), EMPTY)
         self.height = np.zeros(cols, dtype=int)
+        self.hash = 0  # zobrist hash of the stones, kept up to date by Move / UndoMove
+        self.mirror_hash = 0  # hash of the left-right mirrored stones
+        self.zobrist = zobrist_table(rows, cols)
+        self.lines, self.line_counts = win_lines(rows, cols, k)
+
+    def __getstate__(self):
+        # the zobrist and line tables are shared, don't copy / pickle them with every board
+        state = self.__dict__.copy()
+        del state['zobrist'], state['lines'], state['line_counts']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.zobrist = zobrist_table(self.rows, self.cols)
+        self.lines, self.line_counts = win_lines(self.rows, self.cols, self.k)
 
     def Columns(self):
         return self.cols
 
+    def Symmetric(self):
+        return self.hash == self.mirror_hash
+
     def MoveLegal(self, col):
         return self.field[self.rows - 1, col] == EMPTY
 
@@ -26,6 +99,8 @@ class Board:
         if not self.MoveLegal(col):
             return False
         self.field[self.height[col], col] = player
+        self.hash ^= self.zobrist[player][col][self.height[col]]
+        self.mirror_hash ^= self.zobrist[player][self.cols - 1 - col][self.height[col]]
         self.height[col] += 1
         self.LastMover = player
         self.LastCol = col
@@ -35,50 +110,23 @@ class Board:
         if self.height[col] == 0:
             return False
         self.height[col] -= 1
+        self.hash ^= self.zobrist[self.field[self.height[col], col]][col][self.height[col]]
+        self.mirror_hash ^= self.zobrist[self.field[self.height[col], col]][self.cols - 1 - col][self.height[col]]
         self.field[self.height[col], col] = EMPTY
         self.LastCol = prevCol
         self.LastMover = prevMover
         return True
 
     def GameEnd(self, last_col):
+        # only the lines through the top stone of last_col are checked
+        if last_col < 0:  # no move yet
+            return False
         row = self.height[last_col] - 1
         if row < 0:
             return False
-        player = self.field[row, last_col]
-
-        # Check vertical
-        if row >= 3 and np.all(self.field[row-3:row+1, last_col] == player):
-            return True
-
-        # Check horizontal
-        for c in range(max(0, last_col - 3), min(self.cols - 3, last_col + 1)):
-            if np.all(self.field[row, c:c+4] == player):
-                return True
-
-            # Check diagonal (/)
-            for dr, dc in [(-1, 1), (1, -1)]:
-                seq = 0
-                for k in range(-3, 4):
-                    r, c = row + dr * k, last_col + dc * k
-                    if 0 <= r < self.rows and 0 <= c < self.cols and self.field[r, c] == player:
-                        seq += 1
-                        if seq == 4:
-                            return True
-                    else:
-                        seq = 0
-
-            # Check diagonal (\)
-            for dr, dc in [(1, 1), (-1, -1)]:
-                seq = 0
-                for k in range(-3, 4):
-                    r, c = row + dr * k, last_col + dc * k
-                    if 0 <= r < self.rows and 0 <= c < self.cols and self.field[r, c] == player:
-                        seq += 1
-                        if seq == 4:
-                            return True
-                    else:
-                        seq = 0
-        return False
+        cell = row * self.cols + last_col
+        lines = self.lines[cell, :self.line_counts[cell]]
+        return bool((self.field.ravel()[lines] == self.field[row, last_col]).all(axis=1).any())
 
 
 def Print_board(B: Board):
@@ -101,27 +149,48 @@ def Print_board(B: Board):
     sys.stdout.flush()
 
 
-def Evaluate(Current: Board, LastMover, iLastCol, iDepth):
+def Evaluate(Current: Board, LastMover, iLastCol, iDepth, tt=None):
     if Current.GameEnd(iLastCol):
         return 1 if LastMover == CPU else -1
 
     if iDepth == 0:
         return 0
 
+    if tt is None:
+        return Expand(Current, LastMover, iDepth, tt)
+    # transposition table: the same position can be reached by different move orders
+    key = table_key(tt, Current, LastMover)
+    dResult = tt.probe(key, iDepth)
+    if dResult is None:
+        dResult = Expand(Current, LastMover, iDepth, tt)
+        tt.store(key, iDepth, dResult)
+    return dResult
+
+
+def Expand(Current: Board, LastMover, iDepth, tt=None, evaluate=Evaluate):
+    # evaluate is used for the children, batch_eval passes its own
     NewMover = HUMAN if LastMover == CPU else CPU
     dTotal = 0
     iMoves = 0
     bAllLose = True
     bAllWin = True
+    # in a symmetric position the right half of the moves mirrors the left half
+    iCols = Current.Columns()
+    results = [0] * iCols if Current.Symmetric() else None
 
-    for iCol in range(Current.Columns()):
+    for iCol in range(iCols):
         if Current.MoveLegal(iCol):
             iMoves += 1
             prevCol = Current.LastCol
             prevMover = Current.LastMover
-            Current.Move(iCol, NewMover)
-            dResult = Evaluate(Current, NewMover, iCol, iDepth - 1)
-            Current.UndoMove(iCol, prevCol, prevMover)
+            if results is not None and iCol > iCols - 1 - iCol:
+                dResult = results[iCols - 1 - iCol]
+            else:
+                Current.Move(iCol, NewMover)
+                dResult = evaluate(Current, NewMover, iCol, iDepth - 1, tt)
+                Current.UndoMove(iCol, prevCol, prevMover)
+                if results is not None:
+                    results[iCol] = dResult
             if dResult > -1:
                 bAllLose = False
             if dResult != 1:
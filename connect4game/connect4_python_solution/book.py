@@ -0,0 +1,67 @@
+import sqlite3
+
+from board import CPU, canonical_key
+
+
+class OpeningBook:
+    # values of searched positions in an SQLite file, kept between games; a position is keyed by the geometry,
+    # its mirror-canonical hash and the search depth, so a hit is the value a new search of that depth would find
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(positions)")]
+        if columns and 'k' not in columns:
+            # a book from before connect-k: its positions are all connect 4, the k column is part of the key
+            self.db.execute("ALTER TABLE positions RENAME TO positions_connect4")
+        self.db.execute("CREATE TABLE IF NOT EXISTS positions (rows INTEGER, cols INTEGER, k INTEGER, key INTEGER, "
+                        "depth INTEGER, value REAL, PRIMARY KEY (rows, cols, k, key, depth))")
+        if columns and 'k' not in columns:
+            self.db.execute("INSERT INTO positions SELECT rows, cols, 4, key, depth, value FROM positions_connect4")
+            self.db.execute("DROP TABLE positions_connect4")
+            self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, B, LastMover, depth):
+        row = self.db.execute("SELECT value FROM positions WHERE rows = ? AND cols = ? AND k = ? AND key = ? "
+                              "AND depth = ?", (B.rows, B.cols, B.k, canonical_key(B, LastMover), depth)).fetchone()
+        return None if row is None else row[0]
+
+    def store(self, B, LastMover, depth, value):
+        self.db.execute("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?, ?)",
+                        (B.rows, B.cols, B.k, canonical_key(B, LastMover), depth, value))
+
+    def best_move(self, B, depth):
+        # (column, value) of the best CPU move in B if all its moves are in the book, otherwise None
+        best = None
+        prevCol = B.LastCol
+        prevMover = B.LastMover
+        for col in range(B.Columns()):
+            if not B.MoveLegal(col):
+                continue
+            B.Move(col, CPU)
+            value = self.lookup(B, CPU, depth - 1)
+            B.UndoMove(col, prevCol, prevMover)
+            if value is None:
+                self.misses += 1
+                return None
+            if best is None or value > best[1]:  # the first of equal moves, like Search.best_move
+                best = (col, value)
+        if best is not None:
+            self.hits += 1
+        return best
+
+    def store_search(self, search, depth):
+        # the root and its children of a finished search of the given depth
+        B = search.B
+        self.store(B, B.LastMover, depth, search.root.value)
+        prevCol = B.LastCol
+        prevMover = B.LastMover
+        for child in search.root.children:
+            col = child.path[-1]
+            B.Move(col, child.mover)
+            self.store(B, child.mover, depth - 1, child.value)
+            B.UndoMove(col, prevCol, prevMover)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
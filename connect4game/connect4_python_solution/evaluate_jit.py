@@ -0,0 +1,138 @@
+import numpy as np
+from numba import njit
+
+from board import EMPTY, CPU, HUMAN, win_lines
+
+# board.Evaluate compiled with numba: the board is a flat int8 array (row * cols + col) plus the column heights,
+# and the recursion is an explicit stack of frames, one per ply below the evaluated position;
+# wins are looked up in the board.win_lines table of the geometry
+
+
+@njit(cache=True)
+def _game_end(field, heights, cols, lines, counts, col):
+    # a full line through the top stone of col
+    row = heights[col] - 1
+    if row < 0:
+        return False
+    cell = row * cols + col
+    player = field[cell]
+    for i in range(counts[cell]):
+        for j in range(lines.shape[2]):
+            if field[lines[cell, i, j]] != player:
+                break
+        else:
+            return True
+    return False
+
+
+@njit(cache=True)
+def _symmetric(field, rows, cols):
+    for r in range(rows):
+        for c in range(cols // 2):
+            if field[r * cols + c] != field[r * cols + cols - 1 - c]:
+                return False
+    return True
+
+
+@njit(cache=True)
+def evaluate_flat(field, heights, rows, cols, lines, counts, last_mover, last_col, depth):
+    # the same value as Evaluate(B, last_mover, last_col, depth) without a transposition table;
+    # field and heights are changed during the search and restored at the end
+    if last_col >= 0 and _game_end(field, heights, cols, lines, counts, last_col):
+        return 1.0 if last_mover == CPU else -1.0
+    if depth == 0:
+        return 0.0
+    # frame f is the position depth - f plies above the horizon
+    mover = np.empty(depth, dtype=np.int64)  # the side that moved last in the frame position
+    nxt = np.empty(depth, dtype=np.int64)  # column that is evaluated next
+    moves = np.empty(depth, dtype=np.int64)
+    total = np.empty(depth, dtype=np.float64)
+    all_lose = np.empty(depth, dtype=np.bool_)
+    all_win = np.empty(depth, dtype=np.bool_)
+    sym = np.empty(depth, dtype=np.bool_)
+    results = np.empty((depth, cols), dtype=np.float64)  # values of the left half of a symmetric position
+
+    sp = 0
+    mover[0] = last_mover
+    nxt[0] = 0
+    moves[0] = 0
+    total[0] = 0.0
+    all_lose[0] = True
+    all_win[0] = True
+    sym[0] = _symmetric(field, rows, cols)
+    while True:
+        f = sp
+        c = nxt[f]
+        done = False
+        v = 0.0
+        if c == cols:
+            # all moves evaluated, none decided the position on its own
+            done = True
+            if all_win[f]:
+                v = 1.0
+            elif all_lose[f]:
+                v = -1.0
+            else:
+                v = total[f] / moves[f]
+        elif heights[c] == rows:
+            nxt[f] += 1
+            continue
+        else:
+            if sym[f] and c > cols - 1 - c:
+                v = results[f, cols - 1 - c]
+            else:
+                new_mover = HUMAN if mover[f] == CPU else CPU
+                field[heights[c] * cols + c] = new_mover
+                heights[c] += 1
+                if _game_end(field, heights, cols, lines, counts, c):
+                    v = 1.0 if new_mover == CPU else -1.0
+                elif f + 1 == depth:
+                    v = 0.0
+                else:
+                    # go one ply deeper, the move is taken back when the frame is done
+                    sp += 1
+                    mover[sp] = new_mover
+                    nxt[sp] = 0
+                    moves[sp] = 0
+                    total[sp] = 0.0
+                    all_lose[sp] = True
+                    all_win[sp] = True
+                    sym[sp] = _symmetric(field, rows, cols)
+                    continue
+                heights[c] -= 1
+                field[heights[c] * cols + c] = EMPTY
+        # v is the value of move c of frame f, or of frame f itself when done; pass finished frames up
+        while True:
+            if done:
+                if f == 0:
+                    return v
+                f -= 1
+                sp = f
+                c = nxt[f]
+                heights[c] -= 1
+                field[heights[c] * cols + c] = EMPTY
+            # the same rules as in board.Expand
+            moves[f] += 1
+            results[f, c] = v
+            if v > -1:
+                all_lose[f] = False
+            if v != 1:
+                all_win[f] = False
+            if v == 1 and mover[f] == CPU:
+                v = 1.0
+                done = True
+            elif v == -1 and mover[f] == HUMAN:
+                v = -1.0
+                done = True
+            else:
+                total[f] += v
+                nxt[f] += 1
+                break
+
+
+def jit_evaluate(Current, LastMover, iLastCol, iDepth, tt=None):
+    # drop-in for board.Evaluate (the table is not used below the task position)
+    field = np.asarray(Current.field, dtype=np.int8).ravel()
+    heights = np.asarray(Current.height, dtype=np.int64)
+    lines, counts = win_lines(Current.rows, Current.cols, Current.k)
+    return evaluate_flat(field, heights, Current.rows, Current.cols, lines, counts, LastMover, iLastCol, iDepth)
@@ -0,0 +1,99 @@
+import atexit
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+
+from board import CPU, table_key, Expand
+
+# search instrumentation: every rank appends Chrome trace events ("ph": "X" spans, times in microseconds)
+# to <dir>/rank<r>.jsonl, one event per line; running this module merges the files into one Chrome trace
+# (chrome://tracing, ui.perfetto.dev) and prints a summary per search (epoch, a CPU move searches several times
+# with a time budget):
+#   python instrument.py TRACE_DIR [trace.json]
+
+nodes = 0  # positions evaluated by counting_evaluate in this process
+
+
+class Tracer:
+    def __init__(self, directory, rank):
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(os.path.join(directory, f"rank{rank}.jsonl"), "w")
+        self.rank = rank
+        self.move = 0  # search (epoch) the events belong to, unless the span names its own
+        atexit.register(self.file.close)
+
+    def span(self, name, start, end, tid=0, **args):
+        args.setdefault('move', self.move)
+        self.file.write(json.dumps({"name": name, "ph": "X", "ts": round(start * 1e6, 1),
+                                    "dur": round((end - start) * 1e6, 1), "pid": self.rank, "tid": tid,
+                                    "args": args}) + "\n")
+
+
+def counting_evaluate(Current, LastMover, iLastCol, iDepth, tt=None):
+    # board.Evaluate that also counts the positions it visits (only used when tracing)
+    global nodes
+    nodes += 1
+    if Current.GameEnd(iLastCol):
+        return 1 if LastMover == CPU else -1
+
+    if iDepth == 0:
+        return 0
+
+    if tt is None:
+        return Expand(Current, LastMover, iDepth, tt, counting_evaluate)
+    key = table_key(tt, Current, LastMover)
+    dResult = tt.probe(key, iDepth)
+    if dResult is None:
+        dResult = Expand(Current, LastMover, iDepth, tt, counting_evaluate)
+        tt.store(key, iDepth, dResult)
+    return dResult
+
+
+def summary(events):
+    # per search and rank: tasks, busy seconds, nodes, nodes per second, communication and queue wait
+    moves = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+    for event in events:
+        rank = moves[event['args']['move']][event['pid']]
+        seconds = event['dur'] / 1e6
+        if event['name'] in ('task', 'master task'):
+            rank['tasks'] += 1
+            rank['busy'] += event['args']['busy']
+            rank['nodes'] += event['args']['nodes']
+        elif event['name'].startswith('comm'):
+            rank['comm'] += seconds
+        elif event['name'] == 'queued task':
+            rank['queue wait'] += event['args']['queue_wait']
+        elif event['name'] == 'search':
+            rank['search'] += seconds
+    for move in sorted(moves):
+        ranks = moves[move]
+        if not ranks[0]['search']:
+            continue  # events between the searches
+        search_time = ranks[0]['search']
+        total_busy = sum(rank['busy'] for rank in ranks.values())
+        share = ranks[0]['busy'] / total_busy if total_busy else 0
+        print(f"Search {move}: {search_time:.3f} s, master compute share {100 * share:.1f}%, "
+              f"queue wait {ranks[0]['queue wait']:.3f} s")
+        for r in sorted(ranks):
+            rank = ranks[r]
+            rate = rank['nodes'] / rank['busy'] if rank['busy'] else 0
+            print(f"  rank {r}: {int(rank['tasks'])} tasks, busy {rank['busy']:.3f} s, {int(rank['nodes'])} nodes "
+                  f"({rate:.0f}/s), communication {rank['comm']:.4f} s")
+
+
+def main():
+    events = []
+    for path in sorted(glob.glob(os.path.join(sys.argv[1], "rank*.jsonl"))):
+        with open(path) as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    events.sort(key=lambda event: event['ts'])
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as f:
+            json.dump({"traceEvents": events}, f)
+    summary(events)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,685 @@
+import contextlib
+import copy
+import json
+import math
 import random
+import sys
 import time
-import queue
+from collections import deque
 import numpy as np
 from mpi4py import MPI
-from board import Board, Print_board, Evaluate, CPU, HUMAN, EMPTY
-from node import Node, evaluate_node
-from task import generate_tasks
+from batch_eval import batch_evaluate
+from board import Board, Print_board, CPU, HUMAN, EMPTY, canonical_key
+from book import OpeningBook
+import instrument
+from instrument import Tracer, counting_evaluate
+from bitboard import BitBoard
+from negamax import AlphaBeta
+from node import Node
+from pool_backend import PoolBackend
+from positions import read_positions, swap_players, game_over
+from protocol import (inbox_size, reply_size, encode_root, decode_position, encode_task, decode_task,
+                      play_path, undo_path, encode_result, encode_split, decode_reply, MessageStats, ABORTED)
+from search import Search
+from task import TaskRun, ChunkedRun
+from ttable import TranspositionTable
+from shared_ttable import SharedTranspositionTable
 
 DEPTH = 7
+ENGINE = 'evaluate'  # 'evaluate': averaged win score (board.Evaluate) on all ranks, 'negamax': alpha-beta on the master
+NEGAMAX_MAX_DEPTH = 42  # iterative deepening stops here, at a decided position or when the time budget runs out
+NEGAMAX_TIME_BUDGET = 2.0  # seconds per CPU move
+TIME_BUDGET = None  # seconds per CPU move for the 'evaluate' engine (deepening up to DEPTH), None: always DEPTH
+BACKEND = 'mpi'  # 'mpi': tasks go to the MPI worker ranks, 'pool': to local processes (run without mpiexec)
+POOL_WORKERS = None  # processes of the 'pool' backend, None: one per CPU
+POOL_LEVEL = 2  # the pool does not split tasks, so it needs more of them than the MPI ranks
 ROWS = 6
 COLS = 7
+CONNECT = 4  # stones in a line that win
 LEVEL = 1  # 1: 7 tasks, 2: 49 tasks, 3: 343 tasks
+BITBOARD = True  # True: bitboard backend (bitboard.BitBoard), False: numpy backend (board.Board)
+USE_JIT = False  # evaluate below the task positions with the numba kernel (evaluate_jit), without the table
+BATCH_LEAVES = False  # workers check the last plies of their tasks in numpy batches (batch_eval), pays off with
+BATCH_MIN_DEPTH = 3  # the numpy board; tasks shallower than this have too few leaves and are evaluated as usual
+SYMMETRY = True  # send mirrored tasks once and key the transposition table on the mirror-canonical position
+USE_TT = True  # transposition table in every rank
+PREFETCH = 2  # tasks kept queued at every worker
+MASTER_CHUNK_DEPTH = 4  # the master evaluates its own task in pieces of at most this depth
+DEADLINE_POLL = 0.01  # longest sleep between two looks for replies while waiting with a deadline (MPI has no timed wait)
+TREE_MEMORY = False  # trace the peak memory of every tree build (tracemalloc makes the build several times slower)
+TT_BYTES = 64 * 2 ** 20  # memory cap of one rank's table
+TT_WARM_START = False  # keep the tables between CPU moves of one game instead of clearing them
+USE_SHARED_TT = False  # share table entries between ranks through MPI one-sided communication
+SHARED_TT_ENTRIES = 2 ** 16  # entries in one rank's shard of the shared table
+SHARED_TT_MIN_DEPTH = 3  # shallower positions are only looked up locally
+PIPELINE = 2  # searches the MPI master keeps in flight at once in batch mode, their tasks fill each other's gaps
+USE_BOOK = False  # look CPU moves up in the opening book before searching, and add every searched position to it
+SELFPLAY_RANDOM_PLIES = 2  # self-play games start with this many random moves, so that they differ
+BOOK_PATH = 'connect4_book.sqlite'  # kept between games, filled offline with: mpiexec -n N python main.py prefill PLIES
+TRACE_DIR = None  # every rank writes its trace events to TRACE_DIR/rank<r>.jsonl, see instrument.py; None: no tracing
+
+
+def parse_options(argv):
+    # --rows R, --cols C, --connect K and --depth D in front of the command override ROWS, COLS, CONNECT and DEPTH
+    # (every rank gets the same command line); returns them and the command
+    options = {'--rows': ROWS, '--cols': COLS, '--connect': CONNECT, '--depth': DEPTH}
+    while len(argv) >= 2 and argv[0] in options:
+        options[argv[0]] = int(argv[1])
+        argv = argv[2:]
+    rows, cols, connect, depth = options.values()
+    if rows < 1 or cols < 1 or not 2 <= connect <= max(rows, cols) or depth < 1:
+        raise ValueError(f"no connect-{connect} on a {rows} x {cols} board searched {depth} plies deep")
+    return rows, cols, connect, depth, argv
+
+
+ROWS, COLS, CONNECT, DEPTH, args = parse_options(sys.argv[1:])
+
+# message tags
+TAG_TASK = 1
+TAG_RESULT = 2
+TAG_TERMINATE = 3
+TAG_TT_CLEAR = 4
+TAG_SPLIT = 5  # master asks a worker to split its task
+TAG_SPLIT_RESULT = 6  # worker's reply: values of the evaluated moves and the moves left
+TAG_ROOT = 7  # root position of a search, its tasks only carry the moves from it
+TAG_CANCEL = 8  # drop all tasks of the given search (epoch)
+TAG_CANCELLED = 9  # worker's confirmation of TAG_CANCEL
+TAG_ABORT = 10  # the result of a task is not needed anymore, the worker replies right away with any value
 
 comm = MPI.COMM_WORLD
 rank = comm.rank
 size = comm.size
 
+tt = TranspositionTable(TT_BYTES, exact_depth=not TT_WARM_START, canonical=SYMMETRY) if USE_TT else None
+if tt is not None and USE_SHARED_TT:
+    tt = SharedTranspositionTable(comm, tt, SHARED_TT_ENTRIES, SHARED_TT_MIN_DEPTH)  # collective
+
+
+tracer = Tracer(TRACE_DIR, rank) if TRACE_DIR is not None else None
+
+if USE_JIT:
+    from evaluate_jit import jit_evaluate as evaluate
+elif tracer is not None:
+    evaluate = counting_evaluate  # Evaluate that counts nodes
+else:
+    from board import Evaluate as evaluate
+
+
+def new_board():
+    return BitBoard(ROWS, COLS, CONNECT) if BITBOARD else Board(ROWS, COLS, CONNECT)
+
 
-def send_task(task, dest):
-    comm.send(task, dest=dest, tag=1)
-    # print(f"Master sent task {task.node.B.LastCol} to worker {dest}", flush=True)
+NO_DATA = np.zeros(0, dtype=np.int64)
+message_stats = MessageStats()
+sends = []  # (request, buffer) of the non-blocking sends, the buffer must live until the send completes
+epoch = 0  # number of the last search, sent with its tasks and the workers' replies, tells the searches apart
+receives = []  # posted receive of every worker's next reply (index worker - 1)
+replies = []  # their buffers
+backend = None  # where the tasks of the 'evaluate' engine run, set up by main
+book = None  # opening book of the master
+
+
+def send(buf, dest, tag, kind):
+    start = time.time()
+    sends.append((comm.Isend(buf, dest=dest, tag=tag), buf))
+    end = time.time()
+    message_stats.add(kind, buf.nbytes, end - start)
+    if tracer is not None:
+        tracer.span('comm ' + kind, start, end, dest=dest, bytes=buf.nbytes)
+
+
+def wait_sends():
+    MPI.Request.Waitall([request for request, _ in sends])
+    sends.clear()
+
+
+def drain_sends():
+    # forget the sends that have completed, without waiting for the others
+    sends[:] = [(request, buf) for request, buf in sends if not request.Test()]
+
+
+def send_root(search_epoch, oldest, B):
+    buf = encode_root(search_epoch, oldest, B)
+    for worker in range(1, size):
+        send(buf, worker, TAG_ROOT, 'root')
 
 
 def terminate_workers():
+    cancel_receives()
     for worker in range(1, size):
-        comm.send(None, dest=worker, tag=3)
+        send(NO_DATA, worker, TAG_TERMINATE, 'terminate')
         # print(f"master sent termination to worker {worker}", flush=True)
+    wait_sends()
+    report_tt_stats()
+
+
+def clear_tt():
+    tt.clear()
+    for worker in range(1, size):
+        send(NO_DATA, worker, TAG_TT_CLEAR, 'tt clear')
+
+
+def report_tt_stats():
+    # collective, every worker joins after its termination message
+    stats = comm.gather(tt.stats() if tt is not None else None, root=0)
+    if rank == 0 and tt is not None:
+        for r, s in enumerate(stats):
+            print(f"Rank {r} TT: {s['hits']} hits, {s['misses']} misses, {s['evictions']} evictions", flush=True)
+            if 'remote_hits' in s:
+                print(f"Rank {r} shared TT: {s['remote_hits']} remote hits, {s['remote_misses']} remote misses, "
+                      f"{s['remote_puts']} puts, {s['recomputed']} recomputed", flush=True)
+    if isinstance(tt, SharedTranspositionTable):
+        tt.free()
 
 
 def print_tree(node, level=0):
     indent = " " * level * 2
-    last_move = f"Value: {node.value}: Col {node.B.LastCol}, Player {'CPU' if node.B.LastMover == CPU else 'HUMAN'}"
+    last_move = (f"Value: {node.value}: Col {node.path[-1] if node.path else -1}, "
+                 f"Player {'CPU' if node.mover == CPU else 'HUMAN'}")
     print(f"{indent}Node({last_move})", flush=True)
     for child in node.children:
         print_tree(child, level + 1)
 
 
-def cpu_make_move(B, iDepth):
-    # generate tree nodes & tasks
-    tasks = queue.Queue()
-    root = Node(B)
-    nodes = {}
-    generate_tasks(root, 0, iDepth, tasks, nodes, LEVEL)
-    pending_results = tasks.qsize()  # number of waiting tasks results
-    # print(f"0TASKS INIT: {tasks.qsize()}")
-    # spread out the tasks
-    free_workers = list(range(1, size))
-    while not tasks.empty() or pending_results != 0:
-        while free_workers and not tasks.empty():
-            task = tasks.get()
-            send_task(task, free_workers.pop(0))   # send task to a free worker
-        # all workers have a task, check for the results
+def post_receives():
+    # every worker always has a posted receive for its next reply, the master waits on all of them at once
+    for worker in range(1, size):
+        replies.append(np.zeros(reply_size(COLS), dtype=np.int64))
+        receives.append(comm.Irecv(replies[-1], source=worker, tag=MPI.ANY_TAG))
+
+
+def cancel_receives():
+    for request in receives:
+        request.Cancel()
+    MPI.Request.Waitall(receives)
+    receives.clear()
+    replies.clear()
+
+
+def negamax_move(B):
+    # alpha-beta prunes best when searched in order, so it runs on the master alone
+    col, score, depth = AlphaBeta(B.cols).best_move(B, NEGAMAX_MAX_DEPTH, NEGAMAX_TIME_BUDGET)
+    print(f"The best CPU move: {col}, score: {score}, depth: {depth}", flush=True)
+    return col, score, depth
+
+
+def wait_reply(deadline):
+    # index of a worker's reply, None when the deadline passes first
+    if deadline is None:
+        status = MPI.Status()
+        wait_start = time.time()
+        i = MPI.Request.Waitany(receives, status)
+        if tracer is not None:
+            tracer.span('wait', wait_start, time.time())
+        return i, status
+    pause = 0.0005
+    while True:
         status = MPI.Status()
-        # is there any task result message available
-        message_waiting = comm.Iprobe(source=MPI.ANY_SOURCE, tag=2, status=status)
-        if message_waiting:
-            task_result = comm.recv(source=status.Get_source(), tag=2)
-            # print(f"Master accepts result from {status.Get_source()}", flush=True)
-            nodes[task_result['id']].value = task_result['value']  # save the result value in its node
-            pending_results = pending_results - 1
-            free_workers.append(status.Get_source())  # this worker is now available
+        i, done = MPI.Request.Testany(receives, status)
+        if done:
+            return i, status
+        left = deadline - time.time()
+        if left <= 0:
+            return None, None
+        # the pause grows up to DEADLINE_POLL, so a long wait is not a busy loop
+        time.sleep(min(pause, left))
+        pause = min(2 * pause, DEADLINE_POLL)
+
+
+class Flight:
+    # master side state of one search in flight over the workers
+    def __init__(self, B, iDepth, deadline):
+        global epoch
+        epoch += 1
+        self.epoch = epoch
+        self.deadline = deadline
+        self.start = time.time()
+        self.search = Search(B, iDepth, min(LEVEL, iDepth), SYMMETRY, TREE_MEMORY)
+        self.master_B = copy.deepcopy(B)  # the master's tasks are played on it and taken back when they are done
+        self.cutoffs = 0  # search.cutoffs when the cut tasks were last looked for
+        self.aborted = set()  # ids of the cut tasks the workers were told to drop
+        if tracer is not None:
+            tracer.move = epoch
+            tracer.span('tree build', self.start, time.time(), depth=iDepth, nodes=len(self.search.nodes),
+                        tasks=self.search.pending)
+
+
+def search_move(B, iDepth, busy, deadline=None):
+    # one parallel search of depth iDepth, returns the finished Search or None if the deadline passed first
+    return next(search_flights([(B, iDepth, deadline)], busy))[1]
+
+
+def search_flights(jobs, busy, in_flight=1):
+    # the searches of jobs, (B, iDepth, deadline) each, with up to in_flight of them running at once so that the tasks
+    # of one fill the idle gaps of the others (tree build, the last results); yields (job index, finished Search or
+    # None if its deadline passed, seconds) as they end
+    jobs = enumerate(jobs)
+    flights = {}  # epoch -> flight, the oldest first
+    indexes = {}  # epoch -> job index
+    queued = {worker: deque() for worker in range(1, size)}  # (flight, task) sent to each worker, the first runs
+    started = {}  # worker -> time its first queued task started
+    split_requested = set()  # workers asked to split their running task
+    run = None  # master's own task
+    run_flight = None
+    run_id = None
+    run_path = None
+    run_history = None
+    sent = {}  # (epoch, task id) -> time it was sent (when tracing)
+    run_start = run_busy = run_nodes = 0  # master's task trace
+
+    def end_run(flight, run_id):
+        if tracer is not None:
+            tracer.span('master task', run_start, time.time(), id=run_id, busy=run_busy,
+                        nodes=instrument.nodes - run_nodes, move=flight.epoch)
+
+    def handle_reply(worker, status):
+        recv_start = time.time()
+        tag = status.Get_tag()
+        if tag == TAG_CANCELLED:
+            receives[worker - 1] = comm.Irecv(replies[worker - 1], source=worker, tag=MPI.ANY_TAG)
+            return
+        reply = decode_reply(replies[worker - 1], split=tag == TAG_SPLIT_RESULT)
+        receives[worker - 1] = comm.Irecv(replies[worker - 1], source=worker, tag=MPI.ANY_TAG)
+        task_id, task_epoch, worker_busy = reply[:3]
+        for i, (flight, task) in enumerate(queued[worker]):
+            if flight.epoch == task_epoch and task.node.id == task_id:
+                del queued[worker][i]
+                break
+        else:
+            return  # a task of a cancelled search that was finished before the worker got the cancel
+        busy[worker] += worker_busy
+        if tag == TAG_RESULT and math.isnan(reply[3]):
+            flight.search.drop(task_id)  # an aborted task, it has no value
+        elif tag == TAG_RESULT:
+            flight.search.result(task_id, reply[3])
         else:
-            # if there is no waiting message, master is working on a task
-            if not tasks.empty():
-                task = tasks.get()
-                dResult = Evaluate(task.node.B, task.node.B.LastMover, task.node.B.LastCol, task.depth)
-                pending_results = pending_results - 1  # one more task is done
-                nodes[task.node.id].value = dResult  # save the result task number in its node using a dict
-    # all tasks results are present, calculate the root result
-    evaluate_node(root)
-    best_root_child: Node = max(root.children, key=lambda child: child.value)  # this is the best CPU move
-    B.Move(best_root_child.B.LastCol, best_root_child.B.LastMover)   # CPU makes its best move possibles
-    print(f"The best CPU move: {best_root_child.B.LastCol}, value: {best_root_child.value}", flush=True)
+            flight.search.split(task_id, task.depth, reply[3], reply[4])
+        started[worker] = time.time()
+        split_requested.discard(worker)
+        recv_end = time.time()
+        message_stats.add('result' if tag == TAG_RESULT else 'split result', status.Get_count(MPI.BYTE),
+                          recv_end - recv_start)
+        if tracer is not None:
+            # from sending to the reply: the time the task waited in the worker's queue and the task itself
+            sent_at = sent.pop((task_epoch, task_id))
+            tracer.span('queued task', sent_at, recv_end, tid=worker, id=task_id, busy=worker_busy,
+                        queue_wait=max(recv_end - sent_at - worker_busy, 0.0), move=task_epoch)
+
+    def cancel(flight):
+        # the workers drop the tasks of the flight, their replies to the ones already done are ignored
+        for worker in queued:
+            if any(f is flight for f, _ in queued[worker]):
+                send(np.array([flight.epoch], dtype=np.int64), worker, TAG_CANCEL, 'cancel')
+                queued[worker] = deque(entry for entry in queued[worker] if entry[0] is not flight)
+                started[worker] = time.time()
+                split_requested.discard(worker)
+
+    def next_tasks():
+        # the flight whose tasks go out first: the oldest one that has some
+        return next((flight for flight in flights.values() if not flight.search.tasks.empty()), None)
+
+    while True:
+        while len(flights) < in_flight:
+            job = next(jobs, None)
+            if job is None:
+                break
+            index, (B, iDepth, deadline) = job
+            flight = Flight(B, iDepth, deadline)
+            flights[flight.epoch] = flight
+            indexes[flight.epoch] = index
+            send_root(flight.epoch, min(flights), B)
+        if not flights:
+            return
+        ended = None
+        for flight in flights.values():
+            if flight.search.finished():
+                ended = (flight, flight.search)
+                break
+            if flight.deadline is not None and time.time() > flight.deadline:
+                cancel(flight)
+                ended = (flight, None)
+                break
+        if ended is not None:
+            flight, result = ended
+            if run is not None and run_flight is flight:
+                undo_path(flight.master_B, run_path, run_history)
+                end_run(flight, run_id)
+                run = None
+            del flights[flight.epoch]
+            drain_sends()  # a batch can run many searches, their finished sends must not pile up
+            if tracer is not None:
+                tracer.span('search', flight.start, time.time(), finished=result is not None, move=flight.epoch)
+            yield indexes.pop(flight.epoch), result, time.time() - flight.start
+            continue
+        for flight in flights.values():
+            search = flight.search
+            if search.cutoffs > flight.cutoffs:
+                # results decided some nodes early, stop the tasks below them that are already out
+                flight.cutoffs = search.cutoffs
+                for worker in queued:
+                    for f, task in queued[worker]:
+                        if f is flight and task.node.id not in flight.aborted and search.cut(task.node):
+                            send(np.array([task.node.id, flight.epoch], dtype=np.int64), worker, TAG_ABORT, 'abort')
+                            flight.aborted.add(task.node.id)
+                            search.forget(task.node)  # no new twins for a task that may give no value
+                if run is not None and run_flight is flight and search.cut(search.nodes[run_id]):
+                    undo_path(flight.master_B, run_path, run_history)
+                    search.drop(run_id)
+                    end_run(flight, run_id)
+                    run = None
+        # keep PREFETCH tasks queued at every worker, so it never waits for the master between tasks
+        for depth in range(PREFETCH):
+            for worker in range(1, size):
+                if len(queued[worker]) == depth:
+                    flight = next_tasks()
+                    if flight is None:
+                        break
+                    task = flight.search.tasks.get()
+                    send(encode_task(task, flight.epoch), worker, TAG_TASK, 'task')
+                    if tracer is not None:
+                        sent[flight.epoch, task.node.id] = time.time()
+                    if depth == 0:
+                        started[worker] = time.time()
+                    queued[worker].append((flight, task))
+        # handle the replies that are already here
+        statuses = [MPI.Status() for _ in receives]
+        ready = MPI.Request.Testsome(receives, statuses) or []
+        for i, status in zip(ready, statuses):
+            handle_reply(i + 1, status)
+        if ready:
+            continue
+        if run is not None:
+            # master works on its task in bounded chunks, so it is back to dispatching soon
+            step_start = time.time()
+            run.step()
+            busy[0] += time.time() - step_start
+            run_busy += time.time() - step_start
+            if run.finished():
+                run_flight.search.result(run_id, run.value)
+                undo_path(run_flight.master_B, run_path, run_history)
+                end_run(run_flight, run_id)
+                run = None
+            elif next_tasks() is None and len(run.todo) >= 2 and any(not q for q in queued.values()):
+                # give the rest of master's task to the idle workers
+                done, rest = run.split()
+                undo_path(run_flight.master_B, run_path, run_history)
+                run_flight.search.split(run_id, run.depth, done, rest)
+                end_run(run_flight, run_id)
+                run = None
+        elif next_tasks() is not None:
+            run_flight = next_tasks()
+            task = run_flight.search.tasks.get()
+            run_id = task.node.id
+            run_path = task.node.path
+            run_start, run_busy, run_nodes = time.time(), 0.0, instrument.nodes
+            run_history = play_path(run_flight.master_B, run_path)
+            run = ChunkedRun(run_flight.master_B, task.depth, tt, MASTER_CHUNK_DEPTH, evaluate)
+            if run.finished():
+                run_flight.search.result(run_id, run.value)
+                undo_path(run_flight.master_B, run_path, run_history)
+                end_run(run_flight, run_id)
+                run = None
+        else:
+            # nothing left to hand out, ask the longest running workers to split their tasks
+            idle = sum(1 for q in queued.values() if not q) + 1 - len(split_requested)
+            for worker in sorted(started, key=started.get):
+                if idle <= 0:
+                    break
+                if len(queued[worker]) == 1 and worker not in split_requested:
+                    flight, task = queued[worker][0]
+                    send(np.array([task.node.id, flight.epoch], dtype=np.int64), worker, TAG_SPLIT, 'split')
+                    split_requested.add(worker)
+                    idle -= 1
+            # then sleep until a worker replies
+            deadlines = [flight.deadline for flight in flights.values() if flight.deadline is not None]
+            i, status = wait_reply(min(deadlines) if deadlines else None)
+            if i is not None:
+                handle_reply(i + 1, status)
+
+
+class MPIBackend:
+    # the worker ranks of MPI.COMM_WORLD, the master evaluates tasks too
+    ranks = size
+
+    def start_move(self, B):
+        # the root position goes to the workers with every search
+        if tt is not None and not TT_WARM_START:
+            clear_tt()
+
+    def search_move(self, B, iDepth, busy, deadline=None):
+        return search_move(B, iDepth, busy, deadline)
+
+    def search_many(self, jobs, busy, in_flight=1):
+        # a batch of searches is one move for the tables
+        if tt is not None and not TT_WARM_START:
+            clear_tt()
+        return search_flights(jobs, busy, in_flight)
+
+    def end_move(self):
+        wait_sends()
+
+    def close(self):
+        terminate_workers()
+
+
+def new_backend():
+    if BACKEND == 'pool':
+        if size > 1:
+            raise ValueError("the 'pool' backend runs without mpiexec")
+        return PoolBackend(POOL_WORKERS, BitBoard if BITBOARD else Board, ROWS, COLS, CONNECT, POOL_LEVEL, SYMMETRY,
+                           TT_BYTES if USE_TT else None, TT_WARM_START, evaluate, TREE_MEMORY)
+    return MPIBackend()
+
+
+def search_position(B, iDepth, busy, time_budget=None):
+    # searches the CPU move in B, returns the finished Search and the depth it was searched to;
+    # with a time budget the search deepens iteratively up to iDepth and the last complete depth counts
+    backend.start_move(B)
+    if time_budget is None:
+        search = backend.search_move(B, iDepth, busy)
+        depth = iDepth
+    else:
+        deadline = time.time() + time_budget
+        search, depth = None, 0
+        for d in range(1, iDepth + 1):
+            # depth 1 is always finished, so there is a move to play
+            result = backend.search_move(B, d, busy, deadline if search is not None else None)
+            if result is None:
+                break
+            search, depth = result, d
+    backend.end_move()
+    search.best_move()
+    if book is not None:
+        book.store_search(search, depth)
+    return search, depth
+
+
+def cpu_make_move(B, iDepth, time_budget=None):
+    col, value, depth = best_cpu_move(B, iDepth, time_budget)
+    B.Move(col, CPU)   # CPU makes its best move possibles
     return B
 
 
+def best_cpu_move(B, iDepth, time_budget=None):
+    # (column, value, depth) of the CPU move in B, B is not changed
+    if ENGINE == 'negamax':
+        return negamax_move(B)
+    if book is not None:
+        hit = book.best_move(B, iDepth)
+        if hit is not None:
+            col, value = hit
+            print(f"The best CPU move: {col}, value: {value}, depth: {iDepth} (opening book)", flush=True)
+            return col, value, iDepth
+    message_stats.reset()
+    move_start = time.time()
+    busy = [0.0] * backend.ranks  # seconds each rank (or pool process) spent evaluating during this move
+    search, depth = search_position(B, iDepth, busy, time_budget)
+    best_root_child: Node = search.best_move()
+    if search.cutoffs:
+        print(f"Cutoffs: {search.cutoffs} nodes decided early, {search.dropped} tasks dropped", flush=True)
+    col = best_root_child.path[-1]
+    print(f"The best CPU move: {col}, value: {best_root_child.value}, depth: {depth}", flush=True)
+    print(f"Tree: {len(search.nodes)} nodes, built in {1000 * search.build_time:.2f} ms"
+          + (f", peak memory {search.build_bytes / 1024:.1f} KiB" if search.build_bytes is not None else ""),
+          flush=True)
+    move_time = time.time() - move_start
+    for r in range(backend.ranks):
+        print(f"Rank {r}: busy {busy[r]:.2f} s, idle {move_time - busy[r]:.2f} s", flush=True)
+    message_stats.report()
+    if tracer is not None:
+        tracer.span('move', move_start, move_start + move_time, col=col, depth=depth, busy=busy,
+                    messages=message_stats.count, cutoffs=search.cutoffs)
+    return col, best_root_child.value, depth
+
+
+def side_to_move(B):
+    # the board the engine searches for the side to move in B and that side: the engine always searches the CPU move,
+    # so the human side is searched on the board with the stones swapped
+    if B.LastMover == HUMAN:
+        return B, 'cpu'
+    return swap_players(B, new_board()), 'human'
+
+
+def analyse(B):
+    # the move of the side to move in B, for the batch modes
+    searched, player = side_to_move(B)
+    start = time.time()
+    with contextlib.redirect_stdout(sys.stderr):  # the move reports, stdout only has the results
+        col, value, depth = best_cpu_move(searched, DEPTH, TIME_BUDGET)
+    return {'move': col, 'player': player, 'value': value, 'depth': depth, 'seconds': round(time.time() - start, 4)}
+
+
+def batch(path):
+    # the moves of all positions in the file, one JSON line per position as soon as it is searched;
+    # without a time budget the searches go through backend.search_many, PIPELINE of them at once
+    # (so their results can come out of file order)
+    start = time.time()
+    positions = 0
+    pipelined = []  # (name, player, board to search)
+    for name, B in read_positions(path, new_board):
+        positions += 1
+        result = {'position': name}
+        if game_over(B):
+            result['result'] = 'game over'
+        else:
+            searched, player = side_to_move(B)
+            if ENGINE == 'evaluate' and TIME_BUDGET is None and (book is None or
+                                                                 book.best_move(searched, DEPTH) is None):
+                pipelined.append((name, player, searched))
+                continue
+            result.update(analyse(B))
+        print(json.dumps(result), flush=True)
+    busy = [0.0] * backend.ranks
+    for index, search, search_time in backend.search_many([(searched, DEPTH, None) for _, _, searched in pipelined],
+                                                          busy, PIPELINE):
+        name, player, _ = pipelined[index]
+        best_root_child = search.best_move()
+        if book is not None:
+            book.store_search(search, DEPTH)
+        print(json.dumps({'position': name, 'move': best_root_child.path[-1], 'player': player,
+                          'value': best_root_child.value, 'depth': DEPTH, 'seconds': round(search_time, 4)}),
+              flush=True)
+    backend.end_move()
+    seconds = time.time() - start
+    print(f"Batch: {positions} positions in {seconds:.2f} seconds ({positions / seconds:.2f} per second)",
+          file=sys.stderr, flush=True)
+
+
+def self_play(games):
+    # the engine plays both sides, one JSON line per move and one per finished game
+    start = time.time()
+    moves = 0
+    for game in range(games):
+        B = new_board()
+        played = ''
+        for ply in range(SELFPLAY_RANDOM_PLIES):
+            col = random.choice([c for c in range(B.Columns()) if B.MoveLegal(c)])
+            B.Move(col, HUMAN if ply % 2 == 0 else CPU)
+            played += str(col)
+        while not game_over(B):
+            result = analyse(B)
+            B.Move(result['move'], CPU if result['player'] == 'cpu' else HUMAN)
+            played += str(result['move'])
+            moves += 1
+            print(json.dumps({'game': game, 'ply': len(played), **result}), flush=True)
+        if B.GameEnd(B.LastCol):
+            winner = 'cpu' if B.LastMover == CPU else 'human'
+        else:
+            winner = 'draw'
+        print(json.dumps({'game': game, 'moves': played, 'winner': winner}), flush=True)
+    seconds = time.time() - start
+    print(f"Self-play: {games} games, {moves} searched moves in {seconds:.2f} seconds "
+          f"({moves / seconds:.2f} per second)", file=sys.stderr, flush=True)
+
+
+def prefill_book(plies):
+    # searches every position the CPU can face in the first plies of a game (the human moves first)
+    # and adds the ones that are not in the book yet
+    B = new_board()
+    busy = [0.0] * backend.ranks
+    seen = set()
+    positions = 0
+    searched = 0
+    start = time.time()
+
+    def visit(ply):
+        nonlocal positions, searched
+        key = canonical_key(B, B.LastMover)
+        if key in seen:
+            return  # a transposition or mirror image of a visited position
+        seen.add(key)
+        if B.LastMover == HUMAN:
+            positions += 1
+            if book.best_move(B, DEPTH) is None:
+                search_position(B, DEPTH, busy)
+                searched += 1
+        if ply == plies:
+            return
+        prevCol = B.LastCol
+        prevMover = B.LastMover
+        for col in range(B.Columns()):
+            if B.MoveLegal(col):
+                B.Move(col, CPU if prevMover == HUMAN else HUMAN)
+                if not B.GameEnd(col):
+                    visit(ply + 1)
+                B.UndoMove(col, prevCol, prevMover)
+
+    visit(0)
+    print(f"Opening book: {positions} CPU positions up to ply {plies}, {searched} searched "
+          f"in {time.time() - start:.2f} seconds", flush=True)
+
+
 def main():
+    # mpiexec -n N python main.py [OPTIONS]                a game against the CPU
+    #                             [OPTIONS] prefill PLIES  fill the opening book
+    #                             [OPTIONS] batch FILE     the moves of the positions in FILE (see positions.py)
+    #                             [OPTIONS] selfplay GAMES the engine against itself
+    # OPTIONS: --rows R --cols C --connect K --depth D, see parse_options
+
+    global backend, book
 
     # MASTER process
     if rank == 0:
-        B = Board(ROWS, COLS)
+        post_receives()
+        backend = new_backend()
+        if len(args) > 1 and args[0] == 'prefill':
+            book = OpeningBook(BOOK_PATH)
+            prefill_book(int(args[1]))
+            book.close()
+            backend.close()
+            return
+        if USE_BOOK:
+            book = OpeningBook(BOOK_PATH)
+        if len(args) > 1 and args[0] in ('batch', 'selfplay'):
+            # headless: the workers stay up for the whole batch
+            if args[0] == 'batch':
+                batch(args[1])
+            else:
+                self_play(int(args[1]))
+            with contextlib.redirect_stdout(sys.stderr):
+                backend.close()
+            return
+        B = new_board()
         print("Game start!", flush=True)
         random.seed(time.time())
 
@@ -105,17 +705,17 @@ def main():
             if B.GameEnd(user_col):
                 print("Game end. Congrats, you are the winner!", flush=True)
                 Print_board(B)
-                terminate_workers()
+                backend.close()
                 return
             elif np.count_nonzero(B.field == EMPTY) == 0:
                 print("Game end. It's a draw.", flush=True)
                 Print_board(B)
-                terminate_workers()
+                backend.close()
                 return
 
             # CPU's turn to play if not game end
             start_time = time.time()
-            cpu_B = cpu_make_move(B, DEPTH)
+            cpu_B = cpu_make_move(B, DEPTH, TIME_BUDGET)
             end_time = time.time()
             print(f"CPU move calculation time: {end_time - start_time:.2f} seconds", flush=True)
 
@@ -123,33 +723,98 @@ def main():
             if B.GameEnd(cpu_B.LastCol):
                 print("Game end. CPU is the best! hehe", flush=True)
                 Print_board(B)
-                terminate_workers()
+                backend.close()
                 return
             elif np.count_nonzero(B.field == EMPTY) == 0:
                 print("Game end. It's a draw.", flush=True)
                 Print_board(B)
-                terminate_workers()
+                backend.close()
                 return
     # WORKER process
     else:
+        inbox = np.zeros(inbox_size(ROWS, COLS), dtype=np.int64)
+        roots = {}  # epoch -> root position of that search
+        cancelled = set()  # epochs of the searches whose tasks are dropped
+        aborted = set()  # (task id, epoch) of the tasks the master does not need anymore
         while True:
             status = MPI.Status()
-            task = comm.recv(source=0, tag=MPI.ANY_TAG, status=status)
+            comm.Recv(inbox, source=0, tag=MPI.ANY_TAG, status=status)
             tag = status.Get_tag()
 
-            if tag == 1:
-                # print(f"Worker {rank} received task {task.node.B.LastCol}.", flush=True)
-                # do the task
-                dResult = Evaluate(task.node.B, task.node.B.LastMover, task.node.B.LastCol, task.depth)
-                # send result to the master (but include the task.node.id also)
-                data = {'id': task.node.id,
-                        'value': dResult}
-                comm.send(data, dest=0, tag=2)
-                # print(f"worker {rank} sent task result {dResult} for col {task.node.B.LastCol}.", flush=True)
-            elif tag == 3:
+            if tag == TAG_ROOT:
+                search_epoch, oldest = int(inbox[0]), int(inbox[1])
+                # the searches before oldest are over and all their tasks were received already
+                roots = {e: root for e, root in roots.items() if e >= oldest}
+                cancelled = {e for e in cancelled if e >= oldest}
+                aborted = {a for a in aborted if a[1] >= oldest}
+                roots[search_epoch] = decode_position(inbox[2:], new_board())
+                if tracer is not None:
+                    tracer.move = search_epoch
+            elif tag == TAG_CANCEL:
+                cancelled.add(int(inbox[0]))
+                comm.Send(NO_DATA, dest=0, tag=TAG_CANCELLED)
+            elif tag == TAG_ABORT:
+                aborted.add((int(inbox[0]), int(inbox[1])))
+            elif tag == TAG_TASK:
+                task_id, task_epoch, depth, path = decode_task(inbox)
+                if task_epoch in cancelled:
+                    continue  # sent before the search ran out of time
+                if (task_id, task_epoch) in aborted:
+                    comm.Send(encode_result(task_id, task_epoch, ABORTED, 0.0), dest=0, tag=TAG_RESULT)
+                    continue
+                # print(f"Worker {rank} received task {path}.", flush=True)
+                # rebuild the task position from the root, then do the task one move at a time,
+                # so it can be split when other ranks run out of work
+                task_start = time.time()
+                task_nodes = instrument.nodes
+                root = roots[task_epoch]
+                history = play_path(root, path)
+                run = TaskRun(root, depth, tt,
+                              batch_evaluate if BATCH_LEAVES and depth >= BATCH_MIN_DEPTH else evaluate)
+                while not run.finished():
+                    run.step()
+                    if not run.finished() and comm.Iprobe(source=0, tag=TAG_CANCEL):
+                        comm.Recv(inbox, source=0, tag=TAG_CANCEL)
+                        cancelled.add(int(inbox[0]))
+                        comm.Send(NO_DATA, dest=0, tag=TAG_CANCELLED)
+                        if task_epoch in cancelled:
+                            break  # no reply, the master is not waiting for it anymore
+                    elif not run.finished() and comm.Iprobe(source=0, tag=TAG_ABORT):
+                        comm.Recv(inbox, source=0, tag=TAG_ABORT)
+                        aborted.add((int(inbox[0]), int(inbox[1])))
+                        if (task_id, task_epoch) in aborted:
+                            comm.Send(encode_result(task_id, task_epoch, ABORTED, time.time() - task_start),
+                                      dest=0, tag=TAG_RESULT)
+                            break
+                    elif not run.finished() and comm.Iprobe(source=0, tag=TAG_SPLIT):
+                        comm.Recv(inbox, source=0, tag=TAG_SPLIT)
+                        # node ids are reused by every search, the epoch tells a late request from a current one
+                        if inbox[0] == task_id and inbox[1] == task_epoch and len(run.todo) >= 2:
+                            done, rest = run.split()
+                            comm.Send(encode_split(task_id, task_epoch, time.time() - task_start, done, rest), dest=0,
+                                      tag=TAG_SPLIT_RESULT)
+                            break
+                else:
+                    # send result to the master (but include the task id also)
+                    send_start = time.time()
+                    comm.Send(encode_result(task_id, task_epoch, run.value, send_start - task_start), dest=0,
+                              tag=TAG_RESULT)
+                    if tracer is not None:
+                        tracer.span('comm result', send_start, time.time(), move=task_epoch)
+                if tracer is not None:
+                    tracer.span('task', task_start, time.time(), id=task_id, depth=depth,
+                                busy=time.time() - task_start, nodes=instrument.nodes - task_nodes, move=task_epoch)
+                undo_path(root, path, history)
+                # print(f"worker {rank} sent task result {run.value} for {path}.", flush=True)
+            elif tag == TAG_SPLIT:
+                pass  # the task was already finished
+            elif tag == TAG_TT_CLEAR:
+                tt.clear()
+            elif tag == TAG_TERMINATE:
                 # there is no more tasks, master is terminating the worker process
                 # print(f"Worker {rank} received termination signal.", flush=True)
                 break
+        report_tt_stats()
 
 
 if __name__ == "__main__":
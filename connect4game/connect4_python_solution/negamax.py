@@ -0,0 +1,99 @@
+import time
+
+from board import CPU, HUMAN
+
+WIN = 1000  # score of a win, less the number of plies it takes, so faster wins score higher
+CHECK_NODES = 1024  # nodes between two looks at the clock
+
+
+class OutOfTime(Exception):
+    pass
+
+
+class AlphaBeta:
+    # negamax search with alpha-beta pruning; scores are win / loss / draw (0) from the side to move,
+    # moves are ordered centre-first, then killer moves and history heuristic
+    def __init__(self, cols):
+        self.cols = cols
+        self.centre_order = sorted(range(cols), key=lambda col: abs(2 * col - (cols - 1)))
+        self.killers = []  # two killer moves for every ply
+        self.history = [0] * cols
+        self.nodes = 0
+        self.deadline = None
+
+    def order(self, B, ply):
+        moves = [col for col in self.centre_order if B.MoveLegal(col)]
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        # stable sort: killers first, then the higher history, centre-first among equals
+        return sorted(moves, key=lambda col: (col not in killers, -self.history[col]))
+
+    def cutoff(self, col, ply, depth):
+        while len(self.killers) <= ply:
+            self.killers.append([-1, -1])
+        if self.killers[ply][0] != col:
+            self.killers[ply] = [col, self.killers[ply][0]]
+        self.history[col] += depth * depth
+
+    def negamax(self, B, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % CHECK_NODES == 0 and time.time() > self.deadline:
+            raise OutOfTime()
+        if B.LastCol >= 0 and B.GameEnd(B.LastCol):
+            return -(WIN - ply)  # the side that moved last has won
+        moves = self.order(B, ply)
+        if not moves or depth == 0:
+            return 0
+        mover = HUMAN if B.LastMover == CPU else CPU
+        prevCol = B.LastCol
+        prevMover = B.LastMover
+        best = -WIN
+        for col in moves:
+            B.Move(col, mover)
+            try:
+                score = -self.negamax(B, depth - 1, -beta, -alpha, ply + 1)
+            finally:  # OutOfTime leaves the board as it was
+                B.UndoMove(col, prevCol, prevMover)
+            if score > best:
+                best = score
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                self.cutoff(col, ply, depth)
+                break
+        return best
+
+    def search_root(self, B, depth):
+        # best (column, score) of the side to move, searched depth plies deep
+        mover = HUMAN if B.LastMover == CPU else CPU
+        prevCol = B.LastCol
+        prevMover = B.LastMover
+        alpha = -WIN - 1
+        best_col = None
+        for col in self.order(B, 0):
+            B.Move(col, mover)
+            try:
+                score = -self.negamax(B, depth - 1, -WIN - 1, -alpha, 1)
+            finally:
+                B.UndoMove(col, prevCol, prevMover)
+            if score > alpha:
+                alpha = score
+                best_col = col
+        return best_col, alpha
+
+    def best_move(self, B, max_depth, time_budget=None):
+        # iterative deepening, returns (column, score, depth) of the last depth that was searched completely
+        self.deadline = time.time() + time_budget if time_budget is not None else None
+        self.nodes = 0
+        best = None
+        for depth in range(1, max_depth + 1):
+            try:
+                col, score = self.search_root(B, depth)
+            except OutOfTime:
+                break
+            best = (col, score, depth)
+            if abs(score) >= WIN - depth:
+                break  # the game is decided within the horizon, deeper searches find the same
+        if best is None:
+            # not even depth 1 finished: any legal move, centre first
+            best = (self.order(B, 0)[0], 0, 0)
+        return best
@@ -1,12 +1,30 @@
-from board import CPU, Board
+from board import CPU
 
 
 class Node:
-    def __init__(self, B: Board):
-        self.id = id(B)
-        self.B = B
+    # the board of a node is not kept, it is rebuilt from the path by playing it on a scratch board
+    __slots__ = ('id', 'path', 'mover', 'parent', 'children', 'value', 'twins')
+
+    def __init__(self, id, path, mover, parent=None):
+        self.id = id  # index in the search's node list
+        self.path = path  # moves from the root, workers rebuild the board from them
+        self.mover = mover  # the side that moved last in the node position
+        self.parent = parent
         self.children = []
         self.value = None
+        self.twins = []  # nodes with the same (or mirrored) task position, they share this node's result
+
+
+def add_node(nodes, path, mover, parent=None):
+    node = Node(len(nodes), path, mover, parent)
+    nodes.append(node)
+    return node
+
+
+def set_value(node, value):
+    node.value = value
+    for twin in node.twins:
+        twin.value = value
 
 
 def evaluate_node(node):
@@ -14,16 +32,24 @@ def evaluate_node(node):
         return node.value
 
     child_values = [evaluate_node(child) for child in node.children]  # values of node children
+    node.value = combine(node.mover, child_values)
+    return node.value
+
 
-    if node.B.LastMover == CPU and any(value == 1 for value in child_values):
-        node.value = 1
-    elif node.B.LastMover != CPU and any(value == -1 for value in child_values):
-        node.value = -1
+def combine(mover, child_values):
+    # value of a node from its children's values, None while it depends on values that are still missing (None);
+    # one winning child decides the node before the others are known
+    if not child_values:
+        raise ValueError("a node without children has no value to combine, its value must be set")
+    if mover == CPU and any(value == 1 for value in child_values):
+        return 1
+    elif mover != CPU and any(value == -1 for value in child_values):
+        return -1
+    elif any(value is None for value in child_values):
+        return None
     elif all(value == -1 for value in child_values):
-        node.value = -1
+        return -1
     elif all(value == 1 for value in child_values):
-        node.value = 1
+        return 1
     else:
-        node.value = sum(child_values) / len(child_values)
-
-    return node.value
+        return sum(child_values) / len(child_values)
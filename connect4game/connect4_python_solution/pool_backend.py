@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+
+from board import Evaluate
+from protocol import encode_position, decode_position, play_path, undo_path
+from search import Search
+from task import TaskRun
+from ttable import TranspositionTable
+
+# worker process state, set up once by init_worker and kept across moves
+_cancelled = None  # epoch of the last cancelled search, shared with the master
+_shared_root = None  # the master's current move number and its encoded root position, shared with the master
+_new_board = None
+_tt = None
+_warm_start = False
+_evaluate = None
+_move = None  # number of the CPU move whose root position is in _root
+_root = None
+
+
+def init_worker(cancelled, shared_root, board_class, rows, cols, k, tt_bytes, warm_start, symmetry, evaluate):
+    global _cancelled, _shared_root, _new_board, _tt, _warm_start, _evaluate
+    _cancelled = cancelled
+    _shared_root = shared_root
+    _new_board = lambda: board_class(rows, cols, k)
+    _tt = TranspositionTable(tt_bytes, exact_depth=not warm_start, canonical=symmetry) if tt_bytes else None
+    _warm_start = warm_start
+    _evaluate = evaluate
+
+
+def run_task(move, epoch, task_id, depth, path):
+    # the same as a task in the MPI worker loop: the root position is read from the shared one once per CPU move,
+    # the task itself is only the move path from it
+    global _move, _root
+    if epoch <= _cancelled.value:
+        return None
+    if move != _move:
+        shared = np.frombuffer(_shared_root, dtype=np.int64)
+        if shared[0] != move:
+            return None  # a left over task of an earlier move, its search is over
+        _move, _root = move, decode_position(shared[1:], _new_board())
+        if _tt is not None and not _warm_start:
+            _tt.clear()
+    task_start = time.time()
+    history = play_path(_root, path)
+    run = TaskRun(_root, depth, _tt, _evaluate)
+    while not run.finished() and epoch > _cancelled.value:
+        run.step()
+    undo_path(_root, path, history)
+    if not run.finished():
+        return None  # cancelled, the master is not waiting for it anymore
+    return task_id, run.value, time.time() - task_start, os.getpid()
+
+
+class PoolBackend:
+    # runs the tasks in a pool of local processes instead of MPI ranks; the pool lives for the whole game,
+    # every process keeps its own transposition table and the root position of the current move
+    def __init__(self, workers, board_class, rows, cols, k, level, symmetry=True, tt_bytes=None, warm_start=False,
+                 evaluate=Evaluate, trace_memory=False):
+        self.workers = workers or os.cpu_count()
+        self.level = level
+        self.symmetry = symmetry
+        self.trace_memory = trace_memory
+        self.cancelled = multiprocessing.Value('q', 0, lock=False)
+        # the move number, then encode_position of its root; written by start_move before the tasks of the move go out
+        self.shared_root = multiprocessing.RawArray('q', 5 + rows * cols)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                        initargs=(self.cancelled, self.shared_root, board_class, rows, cols, k,
+                                                  tt_bytes, warm_start, symmetry, evaluate))
+        self.ranks = self.workers + 1  # busy time is kept for the master (0) and every process
+        self.pids = {}  # process id -> its index in busy
+        self.move = 0
+        self.epoch = 0
+
+    def start_move(self, B):
+        self.move += 1
+        shared = np.frombuffer(self.shared_root, dtype=np.int64)
+        shared[1:] = encode_position(B)
+        shared[0] = self.move
+
+    def search_move(self, B, iDepth, busy, deadline=None):
+        # one search of depth iDepth, returns the finished Search or None if the deadline passed first;
+        # tasks are not split, so the tree is built LEVEL plies deep to have enough of them
+        self.epoch += 1
+        search = Search(B, iDepth, min(self.level, iDepth), self.symmetry, self.trace_memory)
+        running = {}  # future -> its task node
+        while not search.tasks.empty():
+            task = search.tasks.get()
+            running[self.pool.submit(run_task, self.move, self.epoch, task.node.id, task.depth,
+                                     task.node.path)] = task.node
+        cutoffs = 0
+        while not search.finished():
+            if search.cutoffs > cutoffs:
+                # tasks below the nodes decided early are dropped if they have not started yet
+                cutoffs = search.cutoffs
+                for future, node in list(running.items()):
+                    if search.cut(node) and future.cancel():
+                        search.drop(node.id)
+                        del running[future]
+                if search.finished():
+                    break
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            ready, _ = wait(running, timeout, return_when=FIRST_COMPLETED)
+            if not ready:
+                self.cancelled.value = self.epoch
+                for future in running:
+                    future.cancel()
+                return None
+            for future in ready:
+                del running[future]
+                task_id, value, worker_busy, pid = future.result()
+                search.result(task_id, value)
+                busy[self.pids.setdefault(pid, len(self.pids) + 1)] += worker_busy
+        return search
+
+    def search_many(self, jobs, busy, in_flight=1):
+        # the processes keep one root position, so the searches run one after the other
+        for index, (B, iDepth, deadline) in enumerate(jobs):
+            start = time.time()
+            self.start_move(B)
+            yield index, self.search_move(B, iDepth, busy, deadline), time.time() - start
+
+    def end_move(self):
+        pass
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,71 @@
+from board import EMPTY, CPU, HUMAN
+
+# positions of the batch mode, one file can mix both forms:
+# - a line of columns played from the empty board, the human first (e.g. 3324)
+# - a board like code_cpp_parts/ploca.txt: a "rows cols" line, then the rows from the top, 0 empty, 1 CPU, 2 human;
+#   the CPU is to move on such a board
+# empty lines and lines starting with '#' are skipped
+
+
+def from_moves(B, moves):
+    for i, col in enumerate(moves):
+        B.Move(int(col), HUMAN if i % 2 == 0 else CPU)
+    return B
+
+
+def from_rows(B, rows):
+    # rows from the top, as in the file; stones are played column by column from the bottom
+    if len(rows) != B.rows or any(len(row) != B.cols for row in rows):
+        raise ValueError(f"the board is not {B.rows} x {B.cols}")
+    for c in range(B.cols):
+        for r in range(B.rows - 1, -1, -1):
+            if rows[r][c] == EMPTY:
+                if any(rows[above][c] != EMPTY for above in range(r)):
+                    raise ValueError(f"column {c} has a stone above an empty cell")
+                break
+            if rows[r][c] not in (CPU, HUMAN):
+                raise ValueError(f"unknown cell {rows[r][c]}")
+            B.Move(c, rows[r][c])
+    B.LastMover = HUMAN
+    # the last human move is not known, any column topped by a human stone will do, else any non-empty column
+    # (game_over checks every column, it doesn't rely on this guess)
+    topped = [c for c in range(B.cols) if B.height[c]]
+    B.LastCol = next((c for c in topped if rows[B.rows - B.height[c]][c] == HUMAN), topped[0] if topped else -1)
+    return B
+
+
+def read_positions(path, new_board):
+    # (name, board) of every position in the file
+    with open(path) as f:
+        lines = [line.split() for line in f]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        name = f"{path}:{i + 1}"
+        if not line or line[0].startswith('#'):
+            i += 1
+        elif len(line) == 2:
+            rows = int(line[0])
+            yield name, from_rows(new_board(), [[int(cell) for cell in row] for row in lines[i + 1:i + 1 + rows]])
+            i += 1 + rows
+        else:
+            yield name, from_moves(new_board(), line[0])
+            i += 1
+
+
+def swap_players(B, new):
+    # B with the CPU and human stones swapped, on the empty board new;
+    # the engine always searches the CPU move, so the human side is searched on the swapped board
+    field = B.field
+    for c in range(B.cols):
+        for r in range(B.height[c]):
+            new.Move(c, HUMAN if field[r][c] == CPU else CPU)
+    new.LastMover = HUMAN if B.LastMover == CPU else CPU
+    new.LastCol = B.LastCol
+    return new
+
+
+def game_over(B):
+    # a line through the top stone of any column, as main.cpp checks it, or a full board
+    return (any(B.height[c] and B.GameEnd(c) for c in range(B.Columns()))
+            or not any(B.MoveLegal(c) for c in range(B.Columns())))
@@ -0,0 +1,126 @@
+import numpy as np
+
+from board import EMPTY, CPU, HUMAN
+
+# all messages are int64 arrays (float values are stored as their bits), sent with buffer-based Send / Recv;
+# a worker receives the root position once per search and then only the move path of every task,
+# the search (epoch) is in every task and every reply, so several searches can share the workers
+MAX_PATH = 32  # longest move path from the root that a task can have (splits make paths longer)
+ABORTED = float('nan')  # value in the result of an aborted task, it is not a position value
+
+
+def inbox_size(rows, cols):
+    # big enough for every message the master sends to a worker
+    return max(6 + rows * cols, 4 + MAX_PATH, 2)
+
+
+def reply_size(cols):
+    # big enough for every message a worker sends to the master
+    return 5 + 3 * cols
+
+
+def encode_position(B):
+    # LastMover, LastCol, rows, cols, then the owner of every cell
+    return np.concatenate(([B.LastMover, B.LastCol, B.rows, B.cols],
+                           np.asarray(B.field, dtype=np.int64).ravel())).astype(np.int64)
+
+
+def encode_root(epoch, oldest, B):
+    # the root position of search epoch; oldest is the first search still running, the workers forget the older ones
+    return np.concatenate(([epoch, oldest], encode_position(B)))
+
+
+def decode_position(buf, B):
+    # B is an empty board of the right size
+    rows, cols = int(buf[2]), int(buf[3])
+    field = buf[4:4 + rows * cols].reshape(rows, cols)
+    for c in range(cols):
+        for r in range(rows):
+            if field[r, c] == EMPTY:
+                break
+            B.Move(c, int(field[r, c]))
+    B.LastMover = int(buf[0])
+    B.LastCol = int(buf[1])
+    return B
+
+
+def encode_task(task, epoch):
+    path = task.node.path
+    if len(path) > MAX_PATH:
+        raise ValueError(f"task path longer than {MAX_PATH} moves")
+    return np.array([task.node.id, epoch, task.depth, len(path), *path], dtype=np.int64)
+
+
+def decode_task(buf):
+    # task id, epoch (search number), depth, move path from the root
+    n = int(buf[3])
+    return int(buf[0]), int(buf[1]), int(buf[2]), [int(col) for col in buf[4:4 + n]]
+
+
+def play_path(B, path):
+    # plays the moves of path on B, returns what is needed to take them back with undo_path
+    history = []
+    for col in path:
+        history.append((B.LastCol, B.LastMover))
+        B.Move(col, HUMAN if B.LastMover == CPU else CPU)
+    return history
+
+
+def undo_path(B, path, history):
+    for col in reversed(path):
+        prevCol, prevMover = history.pop()
+        B.UndoMove(col, prevCol, prevMover)
+
+
+def encode_result(task_id, epoch, value, busy):
+    buf = np.zeros(4, dtype=np.int64)
+    buf[:2] = (task_id, epoch)
+    buf.view(np.float64)[2:] = (value, busy)
+    return buf
+
+
+def encode_split(task_id, epoch, busy, done, rest):
+    # task id, epoch, busy, number of done moves, their columns and values, number of moves left, their columns
+    buf = np.zeros(5 + 2 * len(done) + len(rest), dtype=np.int64)
+    buf[:2] = (task_id, epoch)
+    buf.view(np.float64)[2] = busy
+    buf[3] = len(done)
+    buf[4:4 + len(done)] = list(done.keys())
+    buf.view(np.float64)[4 + len(done):4 + 2 * len(done)] = list(done.values())
+    buf[4 + 2 * len(done)] = len(rest)
+    buf[5 + 2 * len(done):] = rest
+    return buf
+
+
+def decode_reply(buf, split):
+    # result: (task id, epoch, busy, value), split: (task id, epoch, busy, done, rest)
+    fbuf = buf.view(np.float64)
+    if not split:
+        return int(buf[0]), int(buf[1]), float(fbuf[3]), float(fbuf[2])
+    n_done = int(buf[3])
+    done = {int(buf[4 + i]): float(fbuf[4 + n_done + i]) for i in range(n_done)}
+    n_rest = int(buf[4 + 2 * n_done])
+    rest = [int(col) for col in buf[5 + 2 * n_done:5 + 2 * n_done + n_rest]]
+    return int(buf[0]), int(buf[1]), float(fbuf[2]), done, rest
+
+
+class MessageStats:
+    # bytes and time spent in communication calls, per message type
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = {}
+        self.bytes = {}
+        self.seconds = {}
+
+    def add(self, kind, nbytes, seconds):
+        self.count[kind] = self.count.get(kind, 0) + 1
+        self.bytes[kind] = self.bytes.get(kind, 0) + nbytes
+        self.seconds[kind] = self.seconds.get(kind, 0.0) + seconds
+
+    def report(self):
+        for kind in self.count:
+            n = self.count[kind]
+            print(f"{kind}: {n} messages, {self.bytes[kind]} bytes ({self.bytes[kind] / n:.0f} per message), "
+                  f"{1e6 * self.seconds[kind] / n:.1f} us per message", flush=True)
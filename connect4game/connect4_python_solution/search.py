@@ -0,0 +1,151 @@
+import copy
+import queue
+import time
+import tracemalloc
+
+from board import CPU, HUMAN, canonical_key
+from node import add_node, combine, evaluate_node, set_value
+from protocol import play_path, undo_path
+from task import generate_tasks
+
+
+class Search:
+    # master side state of one CPU move: the node tree, tasks waiting to be sent and results still missing
+    def __init__(self, B, iDepth, level, symmetry=True, trace_memory=False):
+        self.tasks = queue.Queue()
+        self.B = copy.deepcopy(B)  # scratch board, back in the root position after every call
+        self.nodes = []  # node id -> node
+        self.canonical = {} if symmetry else None
+        # tracemalloc makes the build several times slower, so its peak memory is only traced on request
+        tracing = trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if trace_memory:
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        build_start = time.time()
+        self.root = add_node(self.nodes, (), B.LastMover)
+        generate_tasks(self.B, self.root, 0, iDepth, self.tasks, self.nodes, level, self.canonical)
+        self.build_time = time.time() - build_start
+        self.build_bytes = tracemalloc.get_traced_memory()[1] - traced if trace_memory else None
+        if tracing:
+            tracemalloc.stop()
+        self.pending = self.tasks.qsize()  # number of waiting tasks results
+        self.split_nodes = []  # task nodes whose moves were handed out as separate tasks
+        self.cutoffs = 0  # nodes decided before all their children were known
+        self.dropped = 0  # tasks below them that were never evaluated (or whose result was thrown away)
+        self.settle([node for node in self.nodes if node.value is not None])
+
+    def finished(self):
+        return self.tasks.empty() and self.pending == 0
+
+    def result(self, node_id, value):
+        node = self.nodes[node_id]
+        self.pending -= 1
+        if self.cut(node):
+            self.forget(node)
+            self.dropped += 1
+            return
+        set_value(node, value)  # save the result value in its node (and its twins)
+        self.settle([node] + node.twins)
+
+    def drop(self, node_id):
+        # a task of a cut node that will not be evaluated (or whose result is not coming)
+        self.forget(self.nodes[node_id])
+        self.pending -= 1
+        self.dropped += 1
+
+    def forget(self, node):
+        # the node's task will give no value: new positions must not twin with it
+        # (a twin that is needed later would wait for a value that never comes)
+        if self.canonical is None:
+            return
+        history = play_path(self.B, node.path)
+        key = canonical_key(self.B, self.B.LastMover)
+        undo_path(self.B, node.path, history)
+        if self.canonical.get(key) is node:
+            del self.canonical[key]
+
+    def needed(self, node):
+        # False once an ancestor has its value
+        node = node.parent
+        while node is not None:
+            if node.value is not None:
+                return False
+            node = node.parent
+        return True
+
+    def cut(self, node):
+        # the result of a task node is not needed anymore, by the node or any of its twins
+        return not self.needed(node) and not any(self.needed(twin) for twin in node.twins)
+
+    def settle(self, nodes):
+        # passes the values of nodes up the tree as far as they decide their parents,
+        # then drops the queued tasks below the nodes that were decided early
+        cutoffs = self.cutoffs
+        for node in nodes:
+            self.propagate(node)
+        if self.cutoffs > cutoffs:
+            tasks = []
+            while not self.tasks.empty():
+                tasks.append(self.tasks.get())
+            for task in tasks:
+                if self.cut(task.node):
+                    self.drop(task.node.id)
+                else:
+                    self.tasks.put(task)
+
+    def propagate(self, node):
+        parent = node.parent
+        while parent is not None and parent.value is None:
+            values = [child.value for child in parent.children]
+            value = combine(parent.mover, values)
+            if value is None:
+                return
+            if any(child_value is None for child_value in values):
+                if parent is self.root:
+                    return  # the best move needs the values of all root children
+                self.cutoffs += 1
+            set_value(parent, value)
+            for twin in parent.twins:  # a split task node
+                self.propagate(twin)
+            parent = parent.parent
+
+    def split(self, node_id, depth, done, rest):
+        # task node_id was stopped: done holds the values of the moves already evaluated,
+        # the moves in rest become new tasks one level deeper
+        node = self.nodes[node_id]
+        self.pending -= 1
+        self.forget(node)  # the node has no task anymore
+        if self.cut(node):
+            self.dropped += 1
+            return
+        B = self.B
+        history = play_path(B, node.path)
+        prevCol = B.LastCol
+        prevMover = B.LastMover
+        new_mover = HUMAN if node.mover == CPU else CPU
+        for col in sorted(list(done) + list(rest)):
+            B.Move(col, new_mover)
+            child = add_node(self.nodes, node.path + (col,), new_mover, node)
+            node.children.append(child)
+            if col in done:
+                child.value = done[col]
+            else:
+                queued = self.tasks.qsize()
+                generate_tasks(B, child, 0, depth - 1, self.tasks, self.nodes, 0, self.canonical)
+                self.pending += self.tasks.qsize() - queued
+            B.UndoMove(col, prevCol, prevMover)
+        undo_path(B, node.path, history)
+        self.split_nodes.append(node)
+        self.settle([child for child in node.children if child.value is not None])
+
+    def best_move(self):
+        # all tasks results are present: first the split task nodes (the later splits can be below the earlier ones),
+        # then the root
+        # (their values are already passed up as the results came, except below the nodes that were cut)
+        for node in reversed(self.split_nodes):
+            if node.value is None and not self.cut(node):
+                set_value(node, evaluate_node(node))
+        evaluate_node(self.root)
+        return max(self.root.children, key=lambda child: child.value)  # this is the best CPU move
@@ -0,0 +1,86 @@
+import numpy as np
+from mpi4py import MPI
+
+
+class SharedTranspositionTable:
+    # two level table: the rank's own TranspositionTable in front of a table that is sharded over all ranks;
+    # the shard of a key lives on rank key % size and is read / written with one-sided Get / Put,
+    # so the owner never has to answer requests while it is searching
+    def __init__(self, comm, local, entries_per_rank=2 ** 16, min_depth=3):
+        self.comm = comm
+        self.local = local
+        self.canonical = local.canonical
+        self.ranks = comm.size
+        self.entries = 1
+        while 2 * self.entries <= entries_per_rank:
+            self.entries *= 2
+        self.mask = self.entries - 1
+        self.min_depth = min_depth  # only positions this deep are worth a message
+        # every entry is 3 int64 words: key, depth, value (float64 bits)
+        self.win = MPI.Win.Allocate(3 * 8 * self.entries, disp_unit=8, comm=comm)
+        self.shard = np.frombuffer(self.win.tomemory(), dtype=np.int64)
+        self.clear_shard()
+        comm.Barrier()  # all shards are empty before anyone reads them
+        self.buf = np.zeros(3, dtype=np.int64)
+        self.fbuf = self.buf.view(np.float64)
+        self.remote_hits = 0
+        self.remote_misses = 0
+        self.remote_puts = 0
+        self.recomputed = 0
+
+    def target(self, key):
+        owner = key % self.ranks
+        return owner, (3 * ((key // self.ranks) & self.mask), 3, MPI.INT64_T)
+
+    def probe(self, key, depth):
+        value = self.local.probe(key, depth)
+        if value is not None:
+            return value
+        if depth >= self.min_depth:
+            owner, target = self.target(key)
+            self.win.Lock(owner, MPI.LOCK_SHARED)
+            self.win.Get(self.buf, owner, target=target)
+            self.win.Unlock(owner)
+            if self.buf[0] == key and (self.buf[1] == depth or not self.local.exact_depth and self.buf[1] > depth):
+                self.remote_hits += 1
+                value = float(self.fbuf[2])
+                self.local.store(key, depth, value)
+                return value
+            self.remote_misses += 1
+        self.recomputed += 1  # the caller searches this position itself
+        return None
+
+    def store(self, key, depth, value):
+        self.local.store(key, depth, value)
+        if depth >= self.min_depth:
+            # always-replace, a depth-preferred policy would need a read-modify-write under the lock
+            owner, target = self.target(key)
+            self.buf[0] = key
+            self.buf[1] = depth
+            self.fbuf[2] = value
+            self.win.Lock(owner, MPI.LOCK_EXCLUSIVE)
+            self.win.Put(self.buf, owner, target=target)
+            self.win.Unlock(owner)
+            self.remote_puts += 1
+
+    def clear_shard(self):
+        self.win.Lock(self.comm.rank, MPI.LOCK_EXCLUSIVE)
+        self.shard[:] = 0
+        self.win.Unlock(self.comm.rank)
+
+    def clear(self):
+        # only this rank's part, every rank clears its own shard;
+        # a stale entry is still a correct value for its (position, depth)
+        self.local.clear()
+        self.clear_shard()
+
+    def stats(self):
+        stats = self.local.stats()
+        stats.update({'remote_hits': self.remote_hits, 'remote_misses': self.remote_misses,
+                      'remote_puts': self.remote_puts, 'recomputed': self.recomputed})
+        return stats
+
+    def free(self):
+        # collective
+        self.shard = None
+        self.win.Free()
@@ -1,7 +1,5 @@
-import copy
-
-from board import CPU, HUMAN
-from node import Node
+from board import CPU, HUMAN, canonical_key, table_key, Evaluate
+from node import Node, add_node
 
 
 class Task:
@@ -10,24 +8,171 @@ class Task:
         self.depth = depth
 
 
-def generate_tasks(node: Node, level, iDepth, tasks, nodes, agglomeration_level):
-    # add a node in nodes map (map value setter)
-    nodes[node.id] = node
+class TaskRun:
+    # evaluates a task one move at a time, with the same result as Evaluate on the task position;
+    # between moves the run can be stopped and its remaining moves handed out as new tasks;
+    # evaluate is board.Evaluate or a drop-in for it (evaluate_jit.jit_evaluate)
+    def __init__(self, B, depth, tt=None, evaluate=Evaluate):
+        self.B = B
+        self.depth = depth
+        self.tt = tt
+        self.evaluate = evaluate
+        self.value = None
+        self.done = {}  # column -> value of the moves already evaluated
+        self.todo = []  # columns still to evaluate
+        if depth == 0 or B.GameEnd(B.LastCol):
+            self.value = Evaluate(B, B.LastMover, B.LastCol, depth, tt)
+            return
+        if tt is not None:
+            self.key = table_key(tt, B, B.LastMover)
+            self.value = tt.probe(self.key, depth)
+            if self.value is not None:
+                return
+        self.todo = [col for col in range(B.Columns()) if B.MoveLegal(col)]
+        self.symmetric = B.Symmetric()
+        if not self.todo:
+            self.conclude()  # full board
+
+    def finished(self):
+        return self.value is not None
+
+    def mirrored(self, col):
+        # in a symmetric position the value of col is already known if its mirror image was evaluated
+        return self.symmetric and self.B.Columns() - 1 - col in self.done
+
+    def step(self):
+        B = self.B
+        col = self.todo[0]
+        if self.mirrored(col):
+            dResult = self.done[B.Columns() - 1 - col]
+        else:
+            prevCol = B.LastCol
+            prevMover = B.LastMover
+            NewMover = HUMAN if prevMover == CPU else CPU
+            B.Move(col, NewMover)
+            dResult = self.evaluate(B, NewMover, col, self.depth - 1, self.tt)
+            B.UndoMove(col, prevCol, prevMover)
+        self.record(dResult)
+
+    def record(self, dResult):
+        # value of the next move in todo
+        self.done[self.todo.pop(0)] = dResult
+        # the same rules as in board.Expand
+        if dResult == 1 and self.B.LastMover == CPU:
+            self.finish(1)
+        elif dResult == -1 and self.B.LastMover == HUMAN:
+            self.finish(-1)
+        elif not self.todo:
+            self.conclude()
+
+    def conclude(self):
+        # all moves are evaluated and none of them decided the position on its own
+        values = list(self.done.values())
+        if all(value == 1 for value in values):
+            self.finish(1)
+        elif all(value <= -1 for value in values):
+            self.finish(-1)
+        else:
+            self.finish(sum(values) / len(values))
+
+    def finish(self, value):
+        self.value = value
+        if self.tt is not None:
+            self.tt.store(self.key, self.depth, value)
+
+    def split(self):
+        # stop here, returns the evaluated moves and the ones left for others
+        done, todo = self.done, self.todo
+        self.done, self.todo = {}, []
+        return done, todo
+
+
+class ChunkedRun:
+    # TaskRun whose steps are at most chunk_depth deep: moves with deeper subtrees are opened as nested runs,
+    # so whoever runs it (the master) gets control back after a bounded amount of work
+    def __init__(self, B, depth, tt=None, chunk_depth=4, evaluate=Evaluate):
+        self.B = B
+        self.tt = tt
+        self.chunk_depth = chunk_depth
+        self.evaluate = evaluate
+        self.stack = [TaskRun(B, depth, tt, evaluate)]
+        self.moves = []  # (col, prevCol, prevMover) of the moves played to reach the nested runs
+
+    @property
+    def value(self):
+        return self.stack[0].value
+
+    @property
+    def depth(self):
+        return self.stack[0].depth
+
+    @property
+    def todo(self):
+        return self.stack[0].todo
+
+    def finished(self):
+        return self.stack[0].finished()
+
+    def step(self):
+        B = self.B
+        top = self.stack[-1]
+        col = top.todo[0]
+        if top.depth - 1 > self.chunk_depth and not top.mirrored(col):
+            self.moves.append((col, B.LastCol, B.LastMover))
+            B.Move(col, HUMAN if B.LastMover == CPU else CPU)
+            self.stack.append(TaskRun(B, top.depth - 1, self.tt, self.evaluate))
+        else:
+            top.step()
+        # close the finished nested runs
+        while len(self.stack) > 1 and self.stack[-1].finished():
+            dResult = self.stack.pop().value
+            self.undo_move()
+            self.stack[-1].record(dResult)
+
+    def undo_move(self):
+        col, prevCol, prevMover = self.moves.pop()
+        self.B.UndoMove(col, prevCol, prevMover)
+
+    def split(self):
+        # splits the outer run, the nested ones are dropped
+        while len(self.stack) > 1:
+            self.stack.pop()
+            self.undo_move()
+        return self.stack[0].split()
+
+
+def generate_tasks(B, node: Node, level, iDepth, tasks, nodes, agglomeration_level, canonical=None):
+    # B is a scratch board in the node position, children are made and unmade on it
     # set node value if game end
-    if node.B.GameEnd(node.B.LastCol):
-        node.value = 1 if node.B.LastMover == CPU else -1
+    if B.GameEnd(B.LastCol):
+        node.value = 1 if B.LastMover == CPU else -1
         return
     # if max level & not game end -> generate task & stop generating tree
     if level == agglomeration_level:
+        # mirrored (or transposed) task positions are sent only once, canonical maps key -> task node
+        if canonical is not None:
+            key = canonical_key(B, B.LastMover)
+            if key in canonical:
+                canonical[key].twins.append(node)
+                node.value = canonical[key].value  # its task can be finished already (when splits add nodes)
+                return
+            canonical[key] = node
         task = Task(node, iDepth-level)
         tasks.put(task)
         return
 
-    for possible_move in range(0, node.B.cols):
-        if not node.B.MoveLegal(possible_move):
+    if not any(B.MoveLegal(col) for col in range(B.cols)):
+        node.value = Evaluate(B, B.LastMover, B.LastCol, iDepth - level)  # full board, the rule of Evaluate
+        return
+
+    prevCol = B.LastCol
+    prevMover = B.LastMover
+    new_mover = HUMAN if prevMover == CPU else CPU
+    for possible_move in range(0, B.cols):
+        if not B.MoveLegal(possible_move):
             continue
-        B_copy = copy.deepcopy(node.B)
-        B_copy.Move(possible_move, HUMAN if node.B.LastMover == CPU else CPU)
-        child_node = Node(B_copy)
+        B.Move(possible_move, new_mover)
+        child_node = add_node(nodes, node.path + (possible_move,), new_mover, node)
         node.children.append(child_node)
-        generate_tasks(child_node, level+1, iDepth, tasks, nodes, agglomeration_level)
+        generate_tasks(B, child_node, level+1, iDepth, tasks, nodes, agglomeration_level, canonical)
+        B.UndoMove(possible_move, prevCol, prevMover)
@@ -0,0 +1,21 @@
+import pytest
+
+from bitboard import BitBoard
+from board import Board, HUMAN
+from negamax import AlphaBeta
+
+
+def state(B):
+    return B.field.tolist(), list(B.height), B.LastCol, B.LastMover, B.hash
+
+
+@pytest.mark.parametrize('board', [BitBoard, Board])
+def test_timed_out_search_leaves_board_unchanged(board):
+    B = board(6, 7)
+    B.Move(3, HUMAN)
+    before = state(B)
+    engine = AlphaBeta(B.Columns())
+    col, score, depth = engine.best_move(B, 20, time_budget=0.0)  # out of time on the first clock check
+    assert depth < 20
+    assert B.MoveLegal(col)
+    assert state(B) == before
@@ -0,0 +1,80 @@
+import pytest
+
+from bitboard import BitBoard
+from board import Board, Evaluate, CPU, HUMAN
+from protocol import play_path, undo_path
+from search import Search
+from task import TaskRun
+
+
+def by_path(search):
+    return {node.path: node for node in search.nodes}
+
+
+def run_tasks(search, value=None, split_every=0):
+    # answers the queued tasks until the search is finished: with value, every task gets it; otherwise the task
+    # position is evaluated, and every split_every-th task is split after its first move
+    count = 0
+    while not search.finished():
+        task = search.tasks.get()
+        count += 1
+        if value is not None:
+            search.result(task.node.id, value)
+            continue
+        B = search.B
+        history = play_path(B, task.node.path)
+        run = TaskRun(B, task.depth)
+        if split_every and count % split_every == 0 and not run.finished() and len(run.todo) >= 3:
+            run.step()
+            done, rest = run.split()
+            undo_path(B, task.node.path, history)
+            search.split(task.node.id, task.depth, done, rest)
+            continue
+        while not run.finished():
+            run.step()
+        undo_path(B, task.node.path, history)
+        search.result(task.node.id, run.value)
+
+
+def test_twin_of_a_dropped_task_gets_its_own_task():
+    # split -> cutoff drops a queued task -> split -> a new node with the dropped task's position
+    search = Search(BitBoard(6, 7), 7, 2)
+    nodes = by_path(search)
+    search.split(nodes[0, 1].id, 5, {}, list(range(7)))
+    nodes = by_path(search)
+    search.result(nodes[0, 1, 0].id, -1)  # decides (0, 1), the queued (0, 1, 2) is dropped
+    assert nodes[0, 1].value == -1 and search.dropped > 0
+    search.split(nodes[2, 1].id, 5, {}, list(range(7)))
+    nodes = by_path(search)
+    assert nodes[2, 1, 0] not in nodes[0, 1, 2].twins  # the same position, but (0, 1, 2) gives no value
+    run_tasks(search, 0.5)
+    search.best_move()
+    assert nodes[2, 1, 0].value == 0.5
+    assert nodes[2, 1].value == 0.5
+
+
+@pytest.mark.parametrize('board', [BitBoard, Board])
+@pytest.mark.parametrize('moves, depth, level, split_every', [
+    ('', 5, 2, 0),
+    ('', 5, 2, 3),
+    ('33', 6, 2, 2),
+    ('3324', 6, 1, 2),
+    ('332415', 5, 2, 1),
+])
+def test_search_values_match_evaluate(board, moves, depth, level, split_every):
+    # the values of the root moves with splits, cutoffs and twins are the values Evaluate gives
+    B = board(6, 7)
+    for i, col in enumerate(moves):
+        B.Move(int(col), HUMAN if i % 2 == 0 else CPU)
+    search = Search(B, depth, level)
+    run_tasks(search, split_every=split_every)
+    best = search.best_move()
+    values = {}
+    for child in search.root.children:
+        col = child.path[-1]
+        prevCol, prevMover = B.LastCol, B.LastMover
+        B.Move(col, child.mover)
+        values[col] = Evaluate(B, child.mover, col, depth - 1)
+        B.UndoMove(col, prevCol, prevMover)
+        assert child.value == pytest.approx(values[col], abs=1e-12)
+    assert best.value == pytest.approx(max(values.values()), abs=1e-12)
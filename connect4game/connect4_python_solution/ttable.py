@@ -0,0 +1,55 @@
+from array import array
+
+ENTRY_BYTES = 8 + 8 + 1  # key, value, depth
+
+
+class TranspositionTable:
+    # fixed size hash table of Evaluate results, two entries per bucket:
+    # the first one keeps the deepest search (depth-preferred), the second one is always replaced
+    def __init__(self, max_bytes=64 * 2 ** 20, exact_depth=True, canonical=False):
+        buckets = 1
+        while 4 * buckets * ENTRY_BYTES <= max_bytes:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.size = 2 * buckets
+        self.keys = array('q', bytes(8 * self.size))  # key 0 marks an empty entry
+        self.values = array('d', bytes(8 * self.size))
+        self.depths = array('b', bytes(self.size))
+        # exact_depth=False also accepts entries searched deeper than asked for, which is what makes
+        # results from the previous move reusable (its positions come back at a different remaining depth)
+        self.exact_depth = exact_depth
+        # canonical=True keys positions with board.canonical_key, so mirror images share an entry
+        self.canonical = canonical
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def probe(self, key, depth):
+        # the averaged score changes with depth, so by default only an entry of the same depth is reusable
+        i = 2 * (key & self.mask)
+        for j in (i, i + 1):
+            if self.keys[j] == key and (self.depths[j] == depth or not self.exact_depth and self.depths[j] > depth):
+                self.hits += 1
+                return self.values[j]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value):
+        i = 2 * (key & self.mask)
+        if self.keys[i] != 0 and self.depths[i] > depth:
+            i += 1  # keep the deeper entry, use the always-replace slot
+        if self.keys[i] != 0 and self.keys[i] != key:
+            self.evictions += 1
+        self.keys[i] = key
+        self.values[i] = value
+        self.depths[i] = depth
+        self.stores += 1
+
+    def clear(self):
+        self.keys = array('q', bytes(8 * self.size))
+        self.depths = array('b', bytes(self.size))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evictions': self.evictions,
+                'entries': self.size, 'bytes': self.size * ENTRY_BYTES}